@@ -0,0 +1,101 @@
+"""benchmark 실행 환경
+- src/config.py.default를 config module로 읽고 외부 backend를 로컬 대체물로 바꾼다
+    - MySQL -> 임시 SQLite 파일
+    - Twitter, Kakao API -> start_provider_stub()의 로컬 http server
+- src.* module을 import 하기 전에 setup()을 먼저 호출해야 한다
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.machinery import SourceFileLoader
+import importlib.util
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup(**overrides):
+    """config module 준비 후 DevelopmentConfig 반환"""
+    for key, value in {
+        'COGNITO_USER_POOL_ID': 'ap-northeast-2_benchmark',
+        'COGNITO_APP_CLIENT_ID': 'benchmark',
+        'COGNITO_URL': 'https://benchmark.auth.ap-northeast-2.amazoncognito.com/',
+        'AWS_EXECUTION_ENV': 'benchmark',
+        'AWS_DEFAULT_REGION': 'ap-northeast-2',
+        'AWS_ACCESS_KEY_ID': 'benchmark',
+        'AWS_SECRET_ACCESS_KEY': 'benchmark'
+    }.items():
+        os.environ.setdefault(key, value)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    loader = SourceFileLoader('config', os.path.join(ROOT, 'src', 'config.py.default'))
+    spec = importlib.util.spec_from_loader('config', loader)
+    config = importlib.util.module_from_spec(spec)
+    loader.exec_module(config)
+    sys.modules['config'] = config
+
+    database_uri = f'sqlite:///{tempfile.mkstemp(suffix=".db")[1]}?check_same_thread=false'
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'SQLALCHEMY_DATABASE_URI_LOCAL': database_uri,
+        'TWITTER_CONSUMER_KEY': 'benchmark',
+        'TWITTER_CONSUMER_SECRET': 'benchmark',
+        'KAKAO_CONSUMER_KEY': 'benchmark',
+        'KAKAO_CONSUMER_SECRET': 'benchmark',
+        'COGNITO_APP_CLIENT_SECRET': 'benchmark'
+    }
+    settings.update(overrides)
+    for key, value in settings.items():
+        setattr(config.DevelopmentConfig, key, value)
+
+    from src.models.model import init_db
+    init_db()
+    return config.DevelopmentConfig
+
+
+def start_provider_stub(latency=0.0):
+    """Kakao v2/user/me, Twitter 1.1/users/show.json을 흉내내는 로컬 server, base url 반환"""
+    counter = itertools.count(1)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            time.sleep(latency)
+            if self.path.startswith('/v2/user/me'):
+                token = self.headers.get('Authorization', '').split(' ')[-1]
+                body = {
+                    'id': token,
+                    'kakao_account': {
+                        'email': f'{token}@example.com',
+                        'profile': {
+                            'nickname': f'user-{token}',
+                            'profile_image_url': f'http://example.com/{token}_640.jpg',
+                            'thumbnail_image_url': f'http://example.com/{token}_110.jpg'
+                        }
+                    }
+                }
+            else:
+                body = {'profile_image_url': f'http://example.com/{next(counter)}_normal.jpg'}
+
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
@@ -0,0 +1,107 @@
+"""cold start 비용 측정
+- python -X importtime으로 src.app import 시간을 module별로 집계
+- 새 프로세스에서 import 직후 첫 요청(GET /)까지 걸린 시간 측정
+- 매 측정마다 새 인터프리터를 띄우므로 반복 실행해도 결과가 재현된다
+
+사용법
+    $ python benchmarks/cold_start.py --runs 5 --top 20 --output cold_start.json
+
+- src/config.py가 있어야 한다 (config.py.default 참고)
+- AWS_EXECUTION_ENV가 없으면 src.app이 로컬 서버를 실행하므로 측정 프로세스에는 임의 값을 넣는다
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST_SCRIPT = '''
+import json, time
+started_at = time.perf_counter()
+from src.app import app
+imported_at = time.perf_counter()
+response = app.test_client().get('/')
+finished_at = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported_at - started_at) * 1000,
+    'first_request_ms': (finished_at - imported_at) * 1000,
+    'status_code': response.status_code
+}))
+'''
+
+
+def _env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, os.path.join(ROOT, 'src'), env.get('PYTHONPATH')]))
+    env.setdefault('AWS_EXECUTION_ENV', 'benchmark')
+    env.setdefault('AWS_DEFAULT_REGION', env.get('REGION', 'ap-northeast-2'))
+    return env
+
+
+def measure_importtime():
+    """-X importtime 출력(stderr)을 module별 (self, cumulative) us로 변환"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import src.app'],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure_first_request():
+    completed = subprocess.run(
+        [sys.executable, '-c', FIRST_REQUEST_SCRIPT],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help='결과를 저장할 json 파일')
+    args = parser.parse_args()
+
+    cumulative = {}
+    first_requests = []
+    for _ in range(args.runs):
+        for name, (_, cumulative_us) in measure_importtime().items():
+            cumulative.setdefault(name, []).append(cumulative_us)
+        first_requests.append(measure_first_request())
+
+    # 최상위 package 단위 (ex. boto3, flask, src.helper.cognito)
+    top_level = {
+        name: statistics.median(values) / 1000
+        for name, values in cumulative.items()
+        if '.' not in name or name.startswith('src.')
+    }
+    slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    result = {
+        'runs': args.runs,
+        'import_ms': statistics.median(row['import_ms'] for row in first_requests),
+        'first_request_ms': statistics.median(row['first_request_ms'] for row in first_requests),
+        'modules_cumulative_ms': dict(slowest)
+    }
+
+    print(f"import src.app: {result['import_ms']:.1f} ms (median of {args.runs})")
+    print(f"first request : {result['first_request_ms']:.1f} ms")
+    for name, ms in slowest:
+        print(f'  {ms:8.1f} ms  {name}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+"""로그인 / 회원가입 / 정보갱신 / 탈퇴 흐름 microbenchmark
+- 외부 backend 대체
+    - cognito-idp: botocore Stubber (공유 client에 연결)
+    - Twitter, Kakao: _env.start_provider_stub() 로컬 server
+    - MySQL: 임시 SQLite 파일
+- flow별 p50 / p99 / 평균(ms), 1회당 메모리 할당(tracemalloc peak / retained), 외부 호출 수(cognito, provider, SQL) 측정
+- 결과는 json으로 저장, --compare로 이전 결과(다른 commit)와 비교
+
+사용법
+    $ python benchmarks/flows.py --iterations 200 --output flows.json
+    $ python benchmarks/flows.py --iterations 200 --compare flows.json
+"""
+import argparse
+import json
+import platform as python_platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+import _env
+
+
+class Counters:
+    def __init__(self):
+        self.cognito = 0
+        self.provider = 0
+        self.sql = 0
+
+    def snapshot(self):
+        return self.cognito, self.provider, self.sql
+
+
+def build_flows(counters):
+    """{name: (prepare, run)}
+    - prepare(i): 측정에서 제외되는 준비 단계 (stub 응답 등록 등), run에 넘길 값을 반환
+    - run(value): 측정 대상
+    """
+    from botocore.stub import Stubber
+    from flask import g, session
+    from sqlalchemy import event
+    from src.app import app
+    from src.helper.cognito import Cognito, get_cognito_idp_client, group_registry
+    from src.helper.common import map_auth_response_key
+    from src.helper.profile_cache import profile_cache
+    from src.helper.token import token_manager
+    from src.helper.user_flow import Director, ExistingUser, ExistingUserBuilder, NewUser, NewUserBuilder
+    from src.helper.user_loader import user_cache
+    from src.models.model import User, db_session, engine
+
+    client = get_cognito_idp_client()
+    stubber = Stubber(client)
+    stubber.activate()
+    # Stubber가 before-call에서 응답을 돌려주므로 그 앞 단계의 event로 호출 수를 센다
+    client.meta.events.register(
+        'before-parameter-build.cognito-identity-provider',
+        lambda **kwargs: setattr(counters, 'cognito', counters.cognito + 1)
+    )
+    event.listen(engine, 'before_cursor_execute', lambda *args: setattr(counters, 'sql', counters.sql + 1))
+
+    from src.helper.provider_client import provider_client
+    original_get = provider_client.get
+
+    def counting_get(*args, **kwargs):
+        counters.provider += 1
+        return original_get(*args, **kwargs)
+    provider_client.get = counting_get
+
+    stubber.add_response('list_groups', {'Groups': [{'GroupName': 'Kakao'}, {'GroupName': 'Twitter'}]})
+    group_registry.refresh(Cognito())
+
+    cognito = Cognito()
+    flows = {}
+
+    def user_info(i, **changes):
+        info = {
+            'platform': 'Kakao',
+            'user_id': f'bench{i}',
+            'email': f'bench{i}@example.com',
+            'screen_name': f'user-{i}',
+            'profile_image_url': f'http://example.com/{i}.jpg'
+        }
+        info.update(changes)
+        return info
+
+    def insert_user(i, sub):
+        info = user_info(i)
+        db_session.add(User(sub=sub, cognito_username=f'Kakao_bench{i}', **info))
+        db_session.commit()
+        db_session.remove()
+
+    def auth_result():
+        return {'AuthenticationResult': {
+            'AccessToken': 'access-token', 'IdToken': 'id-token', 'RefreshToken': 'refresh-token', 'ExpiresIn': 3600
+        }}
+
+    # map_auth_response_key
+    flows['map_auth_response_key_kakao'] = (
+        lambda i: {'access_token': f'kakao{i}'},
+        lambda resp: map_auth_response_key(resp, 'Kakao')
+    )
+
+    def prepare_twitter(i):
+        profile_cache.invalidate(('Twitter', f'tw{i}'))
+        return {'user_id': f'tw{i}', 'screen_name': f'tw{i}', 'oauth_token': 't', 'oauth_token_secret': 's'}
+    flows['map_auth_response_key_twitter'] = (prepare_twitter, lambda resp: map_auth_response_key(resp, 'Twitter'))
+
+    flows['retrieve_secret_hash'] = (lambda i: f'Kakao_bench{i}', cognito._retrieve_secret_hash)
+
+    # Director / Builder
+    def load_new_user_data(info):
+        director = Director()
+        director.builder = NewUserBuilder(info)
+        director.load_user_data()
+    flows['director_new_user'] = (user_info, load_new_user_data)
+
+    def load_existing_user_data(info):
+        director = Director()
+        director.builder = ExistingUserBuilder(info)
+        director.load_user_data()
+    flows['director_existing_user'] = (lambda i: user_info(i, sub=f'sub-{i}'), load_existing_user_data)
+
+    # NewUser.sign_up_user: group은 미리 로드되어 있으므로 cognito 호출 순서가 고정된다
+    def prepare_sign_up(i):
+        stubber.add_response('sign_up', {'UserConfirmed': False, 'UserSub': f'signup-{i}'})
+        stubber.add_response('admin_confirm_sign_up', {})
+        stubber.add_response('admin_add_user_to_group', {})
+        stubber.add_response('admin_initiate_auth', auth_result())
+        new_user = NewUser()
+        for key, value in user_info(f'signup{i}').items():
+            new_user.add_data(key, value)
+        return new_user
+    flows['sign_up_user'] = (prepare_sign_up, lambda new_user: new_user.sign_up_user())
+
+    # ExistingUser.update_user: 변경 있음 (attribute 갱신 + token 재발급) / 변경 없음
+    def prepare_update(i, changed):
+        sub = f'update-{changed}-{i}'
+        insert_user(f'update{changed}{i}', sub)
+        user_cache.invalidate(sub)
+        token_manager.revoke(sub)
+        if changed:
+            stubber.add_response('admin_update_user_attributes', {})
+        stubber.add_response('admin_initiate_auth', auth_result())
+        existing_user = ExistingUser()
+        info = user_info(f'update{changed}{i}', sub=sub)
+        if changed:
+            info['screen_name'] = f'renamed-{i}'
+        for key, value in info.items():
+            existing_user.add_data(key, value)
+        return existing_user
+    flows['update_user_changed'] = (lambda i: prepare_update(i, True), lambda user: user.update_user())
+    flows['update_user_unchanged'] = (lambda i: prepare_update(i, False), lambda user: user.update_user())
+
+    def prepare_unregister(i):
+        sub = f'leave-{i}'
+        insert_user(f'leave{i}', sub)
+        stubber.add_response('admin_delete_user', {})
+        existing_user = ExistingUser()
+        for key, value in user_info(f'leave{i}', sub=sub).items():
+            existing_user.add_data(key, value)
+        return existing_user
+
+    def unregister(existing_user):
+        existing_user.unregister_user()
+        db_session.remove()
+    flows['unregister_user'] = (prepare_unregister, unregister)
+
+    # before_request: 예전의 요청별 User 조회 -> g.user 최초 접근 (cache miss / hit)
+    insert_user('request', 'request-sub')
+
+    def load_g_user(clear_cache):
+        with app.test_request_context('/'):
+            session['sub'] = 'request-sub'
+            if clear_cache:
+                user_cache.invalidate('request-sub')
+            return g.user
+    flows['g_user_db'] = (lambda i: True, load_g_user)
+    flows['g_user_cached'] = (lambda i: False, load_g_user)
+
+    # main.index
+    anonymous_client = app.test_client()
+    flows['index_anonymous'] = (lambda i: None, lambda _: anonymous_client.get('/'))
+
+    logged_in_client = app.test_client()
+    with logged_in_client.session_transaction() as client_session:
+        client_session['sub'] = 'request-sub'
+        client_session['id_token'] = _signed_id_token()
+    flows['index_logged_in'] = (lambda i: None, lambda _: logged_in_client.get('/'))
+
+    return flows, stubber
+
+
+def _signed_id_token():
+    """로컬 RSA key로 서명한 id token, token verifier가 같은 key set을 사용하도록 설정"""
+    import jwt
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from config import DevelopmentConfig
+    from src.helper.token import cognito_issuer, id_token_verifier, static_jwks_source
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk['kid'] = 'benchmark'
+    id_token_verifier.key_cache.source = static_jwks_source({'keys': [jwk]})
+
+    return jwt.encode(
+        {
+            'sub': 'request-sub',
+            'iss': cognito_issuer(DevelopmentConfig.COGNITO_USER_POOL_ID),
+            'aud': DevelopmentConfig.COGNITO_APP_CLIENT_ID,
+            'token_use': 'id',
+            'exp': int(time.time()) + 3600,
+            'iat': int(time.time()),
+            'name': 'request user',
+            'picture': 'http://example.com/request.jpg',
+            'cognito:groups': ['Kakao']
+        },
+        private_key,
+        algorithm='RS256',
+        headers={'kid': 'benchmark'}
+    )
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def measure(prepare, run, iterations, counters, offset):
+    timings = []
+    calls_before = counters.snapshot()
+    for i in range(iterations):
+        value = prepare(offset + i)
+        started_at = time.perf_counter()
+        run(value)
+        timings.append((time.perf_counter() - started_at) * 1000)
+    calls = [(after - before) / iterations for after, before in zip(counters.snapshot(), calls_before)]
+
+    # tracemalloc은 실행 속도를 떨어뜨리므로 별도로 측정
+    # - peak: 실행 중 최대 할당량, retained: 실행 후에도 남아있는 할당량 (cache 등)
+    peaks, retained = [], []
+    for i in range(max(iterations // 10, 5)):
+        value = prepare(offset + iterations + i)
+        tracemalloc.start()
+        run(value)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        retained.append(current)
+
+    return {
+        'p50_ms': percentile(timings, 50),
+        'p99_ms': percentile(timings, 99),
+        'mean_ms': statistics.mean(timings),
+        'alloc_peak_kb': statistics.median(peaks) / 1024,
+        'alloc_retained_kb': statistics.median(retained) / 1024,
+        'cognito_calls': calls[0],
+        'provider_calls': calls[1],
+        'sql_statements': calls[2]
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=_env.ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--flow', action='append', help='특정 flow만 실행 (여러번 지정 가능)')
+    parser.add_argument('--output', help='결과를 저장할 json 파일')
+    parser.add_argument('--compare', help='비교할 이전 결과 json 파일')
+    args = parser.parse_args()
+
+    provider_url = _env.start_provider_stub()
+    _env.setup(TWITTER_API_URL=f'{provider_url}/1.1/', KAKAO_API_URL=f'{provider_url}/v2/')
+
+    counters = Counters()
+    flows, stubber = build_flows(counters)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['flows']
+
+    results = {}
+    for index, (name, (prepare, run)) in enumerate(flows.items()):
+        if args.flow and name not in args.flow:
+            continue
+        run(prepare(-index - 1))  # warm-up
+        results[name] = measure(prepare, run, args.iterations, counters, offset=index * 100000)
+
+        row = results[name]
+        line = (
+            f"{name:32} p50 {row['p50_ms']:8.3f} ms  p99 {row['p99_ms']:8.3f} ms  "
+            f"alloc {row['alloc_peak_kb']:8.1f} KB  cognito {row['cognito_calls']:.1f}  "
+            f"provider {row['provider_calls']:.1f}  sql {row['sql_statements']:.1f}"
+        )
+        if baseline and name in baseline:
+            line += f"  (p50 {(row['p50_ms'] / baseline[name]['p50_ms'] - 1) * 100:+.1f}%)"
+        print(line)
+    stubber.assert_no_pending_responses()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'python': python_platform.python_version(),
+                'iterations': args.iterations,
+                'flows': results
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
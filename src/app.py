@@ -1,22 +1,25 @@
 import os
 from flask import Flask, session, g
-from src.models.model import User, db_session
-from src.helper.common import cognito
+from src.models.model import db_session, replica_session
+from src.helper.cognito import CognitoQuotaExceeded
+from src.helper.assets import init_app as init_assets
+from src.helper.common import tokengetter
+from src.helper.log import init_logging
+from src.helper.session_store import init_app as init_session_store
+from src.helper.tracing import init_app as init_tracing
+from src.helper.user_loader import AppGlobals
 from src.web_service.leave.views import leave
 from src.web_service.login.views import login
 from src.web_service.logout.views import logout
 from src.web_service.main.views import main
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s :: %(levelname)s :: %(message)s'
-)
-logger = logging.getLogger()
-logger.setLevel('INFO')
+init_logging()
+logger = logging.getLogger(__name__)
 
 def create_app():
     app = Flask(__name__)
+    app.app_ctx_globals_class = AppGlobals  # g.user는 처음 접근할 때 조회
     app.config.from_object('config.DevelopmentConfig')
 
     app.register_blueprint(leave)
@@ -24,31 +27,40 @@ def create_app():
     app.register_blueprint(logout)
     app.register_blueprint(main)
 
-    @app.before_request
-    def before_request():
-        g.user = None
-        if 'sub' in session:
-            g.user = db_session.query(User).filter_by(sub=session['sub']).first()
+    init_tracing(app)
+    init_session_store(app)
+    init_assets(app)
+
+    @app.errorhandler(CognitoQuotaExceeded)
+    def cognito_quota_exceeded(e):
+        """view에서 처리하지 않은 경우 (tokengetter 등) 500 대신 503"""
+        logger.warning('cognito quota exceeded: %s', e)
+        return 'Service temporarily unavailable, please retry shortly.', 503, {'Retry-After': str(app.config['COGNITO_QUEUE_TIMEOUT'])}
+
+    @app.teardown_appcontext
+    def shutdown_session(exception=None):
+        db_session.remove()
+        if replica_session is not None:
+            replica_session.remove()
 
     @app.after_request
     def after_request(response):
-        db_session.close()
         # response.headers["Pragma"] = "no-cache"
         # response.headers["Expires"] = "0"
         # response.headers['X-UA-Compatible'] = 'IE=Edge,chrome=1'
         # response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate, public, max-age=0"
-        print(f'response status_code: {response.status_code}')
+        logger.debug('response status_code: %s', response.status_code)
 
         return response
 
-    @cognito.tokengetter
+    @tokengetter('cognito')
     def get_cognito_token():
         user = g.user
         if user is not None:
-            logger.info(f'session: {session}')
+            logger.debug('session: %s', session)
             return session['id_token']
 
-    logger.info(f'app.url_map: {app.url_map}')
+    logger.debug('app.url_map: %s', app.url_map)
     return app
 
 app = create_app()
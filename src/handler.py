@@ -0,0 +1,34 @@
+"""lambda handler
+- warm-up event(scheduled ping)는 flask routing 전에 처리하고 lazy resource를 미리 준비
+- provisioned concurrency로 초기화되는 컨테이너는 import 시점에 warm-up
+- 그 외 event는 serverless-wsgi로 전달
+- OUTBOX_ENABLED이면 응답을 반환하기 전에 outbox flush (freeze 되는 동안 background thread는 실행되지 않음)
+  flush 시간이 요청 시간에 포함되므로 lambda에서는 outbox로 응답이 빨라지지 않는다 (README 참고)
+- lambda는 이 module을 src.handler로 import 하고 sys.path에는 /var/task, /opt만 있으므로
+  serverless-wsgi의 wsgi_handler처럼 src 디렉토리를 sys.path에 추가 (config import)
+"""
+import os
+import sys
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+import serverless_wsgi
+from config import DevelopmentConfig
+from src.app import app
+from src.helper.outbox import outbox
+from src.helper.warmup import is_warmup_event, warm_up
+
+if os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'provisioned-concurrency':
+    warm_up(app)
+
+
+def handler(event, context):
+    try:
+        if is_warmup_event(event):
+            return warm_up(app)
+        return serverless_wsgi.handle_request(app, event, context)
+    finally:
+        if DevelopmentConfig.OUTBOX_ENABLED:
+            outbox.flush_after_invocation(DevelopmentConfig.OUTBOX_INVOCATION_FLUSH_BUDGET)
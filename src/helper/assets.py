@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from config import DevelopmentConfig
+
+# 압축해서 제공할 content type (이미지는 이미 압축되어 있음)
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class Asset:
+    """content hash가 포함된 파일명과 미리 압축한 본문
+    - variants: content-encoding -> (body, etag), identity는 항상 포함
+    """
+    def __init__(self, name, content):
+        self.name = name
+        self.digest = hashlib.sha256(content).hexdigest()[:12]
+        root, ext = os.path.splitext(name)
+        self.hashed_name = f'{root}.{self.digest}{ext}'
+        self.mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.variants = {'identity': (content, f'"{self.digest}"')}
+
+        if not self.mimetype.startswith(COMPRESSIBLE_TYPES) or len(content) < DevelopmentConfig.ASSET_COMPRESS_MIN_SIZE:
+            return
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) < len(content):
+            self.variants['gzip'] = (compressed, f'"{self.digest}-gz"')
+        brotli = _brotli()
+        if brotli is not None:
+            compressed = brotli.compress(content, quality=11)
+            if len(compressed) < len(content):
+                self.variants['br'] = (compressed, f'"{self.digest}-br"')
+
+
+class AssetManifest:
+    """static folder의 파일을 읽어 hash 파일명을 만든다
+    - 최초 사용 시점에 한 번만 읽는다 (cold start에 포함되지 않음)
+    - 파일명에 hash가 들어있으므로 내용이 바뀌면 url도 바뀌어 오래 cache 해도 된다
+    """
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._assets = None
+        self._by_hashed_name = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    assets = {}
+                    for directory, _, filenames in os.walk(self.static_folder):
+                        for filename in filenames:
+                            path = os.path.join(directory, filename)
+                            name = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                            with open(path, 'rb') as f:
+                                assets[name] = Asset(name, f.read())
+                    self._by_hashed_name = {asset.hashed_name: asset for asset in assets.values()}
+                    self._assets = assets
+        return self._assets
+
+    def get(self, name):
+        return self.load().get(name)
+
+    def get_hashed(self, hashed_name):
+        self.load()
+        return self._by_hashed_name.get(hashed_name)
+
+    def export(self, output_dir):
+        """CDN / S3 업로드용으로 hash 파일명, .gz, .br 파일과 manifest.json 저장"""
+        manifest = {}
+        for name, asset in self.load().items():
+            path = os.path.join(output_dir, asset.hashed_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            for encoding, (body, _) in asset.variants.items():
+                suffix = {'identity': '', 'gzip': '.gz', 'br': '.br'}[encoding]
+                with open(f'{path}{suffix}', 'wb') as f:
+                    f.write(body)
+            manifest[name] = asset.hashed_name
+        with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+def _choose_encoding(asset, accept_encodings):
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.variants and accept_encodings[encoding]:
+            return encoding
+    return 'identity'
+
+
+def init_app(app, blueprint_name='main'):
+    """blueprint의 static 파일을 hash 파일명으로 제공
+    - template에서 asset_url('style.css') -> /main/assets/style.<hash>.css (ASSET_URL_PREFIX가 있으면 CDN 주소)
+    - Cache-Control: immutable, 강한 ETag, If-None-Match -> 304
+    """
+    from flask import Response, abort, request, url_for
+
+    manifest = AssetManifest(app.blueprints[blueprint_name].static_folder)
+    app.extensions['asset_manifest'] = manifest
+
+    def asset_url(filename):
+        asset = manifest.get(filename)
+        if asset is None:
+            return url_for(f'{blueprint_name}.static', filename=filename)
+        if DevelopmentConfig.ASSET_URL_PREFIX:
+            return f'{DevelopmentConfig.ASSET_URL_PREFIX.rstrip("/")}/{asset.hashed_name}'
+        return url_for('assets', filename=asset.hashed_name)
+
+    def serve_asset(filename):
+        asset = manifest.get_hashed(filename)
+        if asset is None:
+            abort(404)
+
+        encoding = _choose_encoding(asset, request.accept_encodings)
+        body, etag = asset.variants[encoding]
+        headers = {
+            'Cache-Control': f'public, max-age={DevelopmentConfig.ASSET_MAX_AGE}, immutable',
+            'ETag': etag
+        }
+        if len(asset.variants) > 1:
+            headers['Vary'] = 'Accept-Encoding'
+        if request.if_none_match.contains(etag.strip('"')):
+            return Response(status=304, headers=headers)
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(body, mimetype=asset.mimetype, headers=headers)
+
+    app.add_url_rule(f'/{blueprint_name}/assets/<path:filename>', endpoint='assets', view_func=serve_asset)
+    app.add_template_global(asset_url)
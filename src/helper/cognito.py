@@ -2,23 +2,250 @@ import base64
 import hmac
 import hashlib
 import os
-import boto3
+import random
+import threading
+import time
 from config import DevelopmentConfig
+from src.helper.cache import TTLCache, MISSING
+from src.helper.tracing import instrument_boto_client, register_stats
 
+# (platform, platform_id) -> sub, warm 컨테이너 내에서 list_users 호출을 줄이기 위한 캐시
+registered_user_cache = TTLCache(
+    maxsize=DevelopmentConfig.REGISTERED_USER_CACHE_SIZE,
+    ttl=DevelopmentConfig.REGISTERED_USER_CACHE_TTL
+)
+register_stats('registered_user_cache', registered_user_cache.stats)
 
-class Cognito:
+_cognito_idp_client = None
+_cognito_idp_client_lock = threading.Lock()
+
+
+def get_cognito_idp_client():
+    """프로세스 전체에서 공유하는 cognito-idp client
+    - 최초 호출 시에만 생성 (client 생성 비용이 크다)
+    - boto3 client는 thread-safe, 생성 과정만 lock으로 보호
+    - warm 컨테이너에서는 열려있는 TLS connection을 재사용
+    - boto3 import 비용도 cold start에 포함되지 않도록 최초 호출 시 import
+    """
+    global _cognito_idp_client
+
+    if _cognito_idp_client is not None:
+        return _cognito_idp_client
+
+    with _cognito_idp_client_lock:
+        if _cognito_idp_client is None:
+            import boto3
+            from botocore.config import Config as BotoConfig
+
+            boto_config = BotoConfig(
+                max_pool_connections=DevelopmentConfig.COGNITO_MAX_POOL_CONNECTIONS,
+                tcp_keepalive=DevelopmentConfig.COGNITO_TCP_KEEPALIVE,
+                connect_timeout=DevelopmentConfig.COGNITO_CONNECT_TIMEOUT,
+                read_timeout=DevelopmentConfig.COGNITO_READ_TIMEOUT,
+                retries={
+                    'mode': DevelopmentConfig.COGNITO_RETRY_MODE,
+                    'total_max_attempts': DevelopmentConfig.COGNITO_MAX_ATTEMPTS
+                }
+            )
+            try:
+                os.environ['AWS_EXECUTION_ENV']
+            except KeyError:
+                session = boto3.session.Session(profile_name=os.environ['ACCOUNT_ID'])
+                _cognito_idp_client = session.client('cognito-idp', region_name=os.environ['REGION'], config=boto_config)
+            else:
+                session = boto3.session.Session()
+                _cognito_idp_client = session.client('cognito-idp', config=boto_config)
+            instrument_boto_client(_cognito_idp_client)
+    return _cognito_idp_client
+
+
+# Cognito는 quota를 API category별로 따로 관리 (https://docs.aws.amazon.com/cognito/latest/developerguide/limits.html)
+# client operation -> category, Cognito method와의 관계
+#   user_read  : is_registered_user, invoke_list_users_page, invoke_admin_get_user
+#   user_create: invoke_sign_up, invoke_admin_confirm_sign_up
+#   user_update: invoke_admin_update_user_attributes, invoke_admin_add_user_to_group, invoke_admin_delete_user
+#   auth       : invoke_admin_initiate_auth, invoke_admin_refresh_auth
+#   resource   : invoke_list_groups, invoke_create_group
+QUOTA_CATEGORIES = {
+    'list_users': 'user_read',
+    'admin_get_user': 'user_read',
+    'sign_up': 'user_create',
+    'admin_confirm_sign_up': 'user_create',
+    'admin_update_user_attributes': 'user_update',
+    'admin_add_user_to_group': 'user_update',
+    'admin_delete_user': 'user_update',
+    'admin_initiate_auth': 'auth',
+    'list_groups': 'resource',
+    'create_group': 'resource'
+}
+
+THROTTLING_ERROR_CODES = ('TooManyRequestsException', 'ThrottlingException')
+
+
+class CognitoQuotaExceeded(Exception):
+    """deadline 안에 quota를 확보하지 못했거나 throttling 재시도를 모두 소진함
+    - view에서는 잠시 후 다시 시도하라는 message로 처리
+    """
+
+
+def _is_throttled(e):
+    response = getattr(e, 'response', None)
+    return isinstance(response, dict) and response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+
+
+class TokenBucket:
+    """초당 rate개, 최대 burst개까지 쌓이는 token bucket
+    - reserve()는 token이 부족해도 미리 차감(음수 허용)하고 기다려야 할 시간을 돌려준다
+        - 먼저 온 호출이 먼저 token을 받는다 (FIFO)
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        """기다려야 할 시간(초) 반환, max_wait보다 길면 차감하지 않고 None"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def acquire(self):
+        """token을 받을 때까지 기다린다 (deadline 없음, 배치 작업용)"""
+        wait = self.reserve(float('inf'))
+        if wait > 0:
+            time.sleep(wait)
+
+
+class CategoryStats:
     def __init__(self):
+        self.calls = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.throttled = 0
+        self.rejected = 0
+
+    def snapshot(self):
+        return {
+            'calls': self.calls,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'queued': self.queued,
+            'avg_wait_ms': self.total_wait / self.queued * 1000 if self.queued else 0.0,
+            'max_wait_ms': self.max_wait * 1000,
+            'throttled': self.throttled,
+            'rejected': self.rejected
+        }
+
+
+class CognitoScheduler:
+    """quota category별 token bucket으로 cognito 호출 속도 조절
+    - token이 없으면 queue_timeout(deadline)까지 기다리고, 그래도 없으면 CognitoQuotaExceeded
+    - TooManyRequestsException(boto3 자체 재시도 이후에도 실패)이면 jitter가 포함된 지수 backoff 후 재시도
+        - 재시도도 deadline 안에서만, 모두 실패하면 CognitoQuotaExceeded
+    - category별 대기 중인 호출 수(queue_depth)와 대기시간 집계 -> stats()
+    - 프로세스 단위 제한이므로 rate는 (계정 quota / 동시 실행 컨테이너 수) 기준으로 설정
+    """
+    def __init__(self, limits, queue_timeout, max_retries, backoff_base, backoff_max):
+        self.buckets = {category: TokenBucket(rate, burst) for category, (rate, burst) in limits.items()}
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._stats = {category: CategoryStats() for category in limits}
+        self._lock = threading.Lock()
+
+    def _acquire(self, category, deadline):
+        bucket, stats = self.buckets[category], self._stats[category]
+        wait = bucket.reserve(max(0.0, deadline - time.monotonic()))
+        if wait is None:
+            with self._lock:
+                stats.rejected += 1
+            raise CognitoQuotaExceeded(f'{category} quota: no capacity within {self.queue_timeout}s')
+        if wait <= 0:
+            return
+
+        with self._lock:
+            stats.queued += 1
+            stats.queue_depth += 1
+            stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
         try:
-            os.environ['AWS_EXECUTION_ENV']
-        except KeyError:
-            boto3.setup_default_session(profile_name=os.environ['ACCOUNT_ID'])
-            self.cognito_idp_client = boto3.client('cognito-idp', region_name=os.environ['REGION'])
-        else:
-            self.cognito_idp_client = boto3.client('cognito-idp')
+            time.sleep(wait)
+        finally:
+            with self._lock:
+                stats.queue_depth -= 1
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, category, fn, **params):
+        if category not in self.buckets:
+            return fn(**params)
+
+        deadline = time.monotonic() + self.queue_timeout
+        with self._lock:
+            self._stats[category].calls += 1
+        attempt = 0
+        while True:
+            self._acquire(category, deadline)
+            try:
+                return fn(**params)
+            except Exception as e:
+                if not _is_throttled(e):
+                    raise
+                with self._lock:
+                    self._stats[category].throttled += 1
+                backoff = self._backoff(attempt)
+                if attempt >= self.max_retries or time.monotonic() + backoff > deadline:
+                    raise CognitoQuotaExceeded(f'{category} quota: throttled after {attempt + 1} attempts') from e
+                attempt += 1
+                time.sleep(backoff)
+
+    def stats(self):
+        with self._lock:
+            return {category: stats.snapshot() for category, stats in self._stats.items()}
+
+
+cognito_scheduler = CognitoScheduler(
+    limits=DevelopmentConfig.COGNITO_RATE_LIMITS,
+    queue_timeout=DevelopmentConfig.COGNITO_QUEUE_TIMEOUT,
+    max_retries=DevelopmentConfig.COGNITO_THROTTLE_RETRIES,
+    backoff_base=DevelopmentConfig.COGNITO_THROTTLE_BACKOFF,
+    backoff_max=DevelopmentConfig.COGNITO_THROTTLE_BACKOFF_MAX
+)
+register_stats('cognito_scheduler', cognito_scheduler.stats)
+
+
+class Cognito:
+    def __init__(self):
         self.cognito_user_pool_id = DevelopmentConfig.COGNITO_USER_POOL_ID
         self.cognito_app_client_id = DevelopmentConfig.COGNITO_APP_CLIENT_ID
         self.cognito_app_client_secret = DevelopmentConfig.COGNITO_APP_CLIENT_SECRET
 
+    @property
+    def cognito_idp_client(self):
+        return get_cognito_idp_client()
+
+    def _call(self, operation, **params):
+        """cognito_scheduler를 거쳐 client 호출 (QUOTA_CATEGORIES 참고)"""
+        return cognito_scheduler.call(
+            QUOTA_CATEGORIES.get(operation),
+            getattr(self.cognito_idp_client, operation),
+            **params
+        )
+
     def _retrieve_secret_hash(self, username):
         dig = hmac.new(
             key=bytes(self.cognito_app_client_secret, 'utf-8'),
@@ -30,6 +257,8 @@ class Cognito:
 
     def is_registered_user(self, platform, platform_id):
         """사용자가 cognito에 등록되었는지 확인
+        - registered_user_cache에 결과가 있으면 list_users를 호출하지 않는다
+        - 미가입 유저(None)도 REGISTERED_USER_CACHE_NEGATIVE_TTL 동안 캐시
         - Filter에는 standard attribute뿐만 아니라, cognito 'User name'도 필터 가능
         - response
             {
@@ -96,7 +325,13 @@ class Cognito:
                 }
             }
         """
-        response = self.cognito_idp_client.list_users(
+        cache_key = (platform, str(platform_id))
+        sub = registered_user_cache.get(cache_key)
+        if sub is not MISSING:
+            return sub
+
+        response = self._call(
+            'list_users',
             UserPoolId=self.cognito_user_pool_id,
             Limit=1,
             # Filter='given_name^=\"jw\"'
@@ -108,8 +343,40 @@ class Cognito:
             sub = response.get('Users')[0].get('Attributes')[0].get('Value')
         except IndexError:
             sub = None  # 신규 유저
+
+        if sub:
+            registered_user_cache.set(cache_key, sub)
+        else:
+            registered_user_cache.set(cache_key, sub, ttl=DevelopmentConfig.REGISTERED_USER_CACHE_NEGATIVE_TTL)
         return sub
 
+    def invoke_list_users_page(self, pagination_token=None, limit=60):
+        """user pool 전체 조회용 (limit 최대 60)
+        - return: Users, 다음 page의 PaginationToken (마지막 page면 None)
+        """
+        params = {
+            'UserPoolId': self.cognito_user_pool_id,
+            'Limit': limit
+        }
+        if pagination_token:
+            params['PaginationToken'] = pagination_token
+
+        response = self._call('list_users', **params)
+        return response.get('Users'), response.get('PaginationToken')
+
+    def invoke_admin_get_user(self, platform, platform_id):
+        """user pool에 사용자가 있으면 sub, 없으면 None (캐시를 거치지 않는다)"""
+        try:
+            response = self._call(
+                'admin_get_user',
+                UserPoolId=self.cognito_user_pool_id,
+                Username=f'{platform}_{platform_id}'
+            )
+        except self.cognito_idp_client.exceptions.UserNotFoundException:
+            return None
+        attributes = {row['Name']: row['Value'] for row in response.get('UserAttributes', [])}
+        return attributes.get('sub')
+
     def invoke_sign_up(self, platform, platform_id, email, name, picture):
         """사용자 등록
         - Username
@@ -144,7 +411,8 @@ class Cognito:
         """
         username = f'{platform}_{platform_id}'
 
-        response = self.cognito_idp_client.sign_up(
+        response = self._call(
+            'sign_up',
             ClientId=self.cognito_app_client_id,
             SecretHash=self._retrieve_secret_hash(username),
             Username=username,
@@ -152,45 +420,43 @@ class Cognito:
             UserAttributes=[
                 {
                     'Name': 'email',
-                    'Value': email
+                    'Value': email or ''
                 },
                 {
                     'Name': 'name',
-                    'Value': name
+                    'Value': name or ''
                 },
                 {
                     'Name': 'picture',
-                    'Value': picture
+                    'Value': picture or ''
                 }
             ]
         )
+        registered_user_cache.invalidate((platform, str(platform_id)))
         return response.get('UserSub')
 
     def invoke_admin_confirm_sign_up(self, platform, platform_id):
-        response = self.cognito_idp_client.admin_confirm_sign_up(
+        response = self._call(
+            'admin_confirm_sign_up',
             UserPoolId=self.cognito_user_pool_id,
             Username=f'{platform}_{platform_id}'
         )
         return response
 
-    def invoke_admin_update_user_attributes(self, platform, platform_id, email, name, picture):
-        """기존 attribute value가 변경이 될 때에만 cognito console에 update time이 변경된다"""
-        response = self.cognito_idp_client.admin_update_user_attributes(
+    def invoke_admin_update_user_attributes(self, platform, platform_id, attributes):
+        """기존 attribute value가 변경이 될 때에만 cognito console에 update time이 변경된다
+        - attributes: {'email': ..., 'name': ..., 'picture': ...} 중 변경된 attribute만 전달
+        """
+        response = self._call(
+            'admin_update_user_attributes',
             UserPoolId=self.cognito_user_pool_id,
             Username=f'{platform}_{platform_id}',
             UserAttributes=[
                 {
-                    'Name': 'email',
-                    'Value': email
-                },
-                {
-                    'Name': 'name',
-                    'Value': name
-                },
-                {
-                    'Name': 'picture',
-                    'Value': picture
+                    'Name': name,
+                    'Value': value or ''
                 }
+                for name, value in attributes.items()
             ]
         )
         return response
@@ -228,7 +494,8 @@ class Cognito:
         """
         username = f'{platform}_{platform_id}'
 
-        response = self.cognito_idp_client.admin_initiate_auth(
+        response = self._call(
+            'admin_initiate_auth',
             UserPoolId=self.cognito_user_pool_id,
             ClientId=self.cognito_app_client_id,
             AuthFlow='ADMIN_USER_PASSWORD_AUTH',
@@ -241,6 +508,26 @@ class Cognito:
 
         return response.get('AuthenticationResult')
 
+    def invoke_admin_refresh_auth(self, platform, platform_id, refresh_token):
+        """RefreshToken으로 AccessToken, IdToken 재발급
+        - AWS::Cognito::UserPoolClient Resource의 ExplicitAuthFlows에 ALLOW_REFRESH_TOKEN_AUTH 필요
+        - response의 AuthenticationResult에는 RefreshToken이 포함되지 않는다
+        """
+        username = f'{platform}_{platform_id}'
+
+        response = self._call(
+            'admin_initiate_auth',
+            UserPoolId=self.cognito_user_pool_id,
+            ClientId=self.cognito_app_client_id,
+            AuthFlow='REFRESH_TOKEN_AUTH',
+            AuthParameters={
+                'REFRESH_TOKEN': refresh_token,
+                'SECRET_HASH': self._retrieve_secret_hash(username)
+            }
+        )
+
+        return response.get('AuthenticationResult')
+
     def invoke_list_groups(self):
         """
             {
@@ -256,28 +543,84 @@ class Cognito:
                     },
                 ],
                 'NextToken': 'string'
-            }        
+            }
+        - NextToken이 없을 때까지 모든 page를 조회
         """
-        response = self.cognito_idp_client.list_groups(
-            UserPoolId=self.cognito_user_pool_id
-        )
-        return [row.get('GroupName') for row in response.get('Groups')]
+        groups = []
+        params = {'UserPoolId': self.cognito_user_pool_id}
+        while True:
+            response = self._call('list_groups', **params)
+            groups.extend(row.get('GroupName') for row in response.get('Groups'))
+            if not response.get('NextToken'):
+                break
+            params['NextToken'] = response.get('NextToken')
+        return groups
 
     def invoke_create_group(self, groupname):
-        self.cognito_idp_client.create_group(
+        self._call(
+            'create_group',
             GroupName=groupname,
             UserPoolId=self.cognito_user_pool_id
         )
 
     def invoke_admin_add_user_to_group(self, platform, platform_id, groupname):
-        self.cognito_idp_client.admin_add_user_to_group(
+        self._call(
+            'admin_add_user_to_group',
             UserPoolId=self.cognito_user_pool_id,
             Username=f'{platform}_{platform_id}',
             GroupName=groupname
         )
 
     def invoke_admin_delete_user(self, platform, platform_id):
-        self.cognito_idp_client.admin_delete_user(
+        self._call(
+            'admin_delete_user',
             UserPoolId=self.cognito_user_pool_id,
             Username=f'{platform}_{platform_id}'
         )
+        registered_user_cache.invalidate((platform, str(platform_id)))
+
+
+class GroupRegistry:
+    """cognito group 목록을 컨테이너 단위로 메모리에 유지
+    - 최초 조회 시 모든 page를 한번에 불러오고, GROUP_REGISTRY_TTL이 지나면 다시 불러온다
+    - create_group 성공 시 목록에 바로 추가
+    - GroupExistsException은 에러가 아니라 목록이 오래되었다는 뜻이므로 재조회로 처리
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._groups = set()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _is_expired(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def refresh(self, cognito):
+        groups = cognito.invoke_list_groups()
+        with self._lock:
+            self._groups = set(groups)
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, cognito):
+        if self._is_expired():
+            self.refresh(cognito)
+
+    def contains(self, cognito, groupname):
+        self.ensure_loaded(cognito)
+        return groupname in self._groups
+
+    def ensure_group(self, cognito, groupname):
+        """group이 없을 때에만 생성"""
+        if self.contains(cognito, groupname):
+            return
+
+        try:
+            cognito.invoke_create_group(groupname)
+        except cognito.cognito_idp_client.exceptions.GroupExistsException:
+            self.refresh(cognito)
+        else:
+            with self._lock:
+                self._groups.add(groupname)
+
+
+group_registry = GroupRegistry(ttl=DevelopmentConfig.GROUP_REGISTRY_TTL)
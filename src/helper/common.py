@@ -1,8 +1,50 @@
 import json
 import os
-from flask_oauthlib.client import OAuth
-import requests
+import threading
+import time
 from config import DevelopmentConfig
+from src.helper.profile_cache import NOT_MODIFIED, ProviderUnavailable, profile_cache
+from src.helper.provider_client import provider_client
+from src.helper.tracing import record
+
+
+def _fetch_twitter_profile_image_url(user_id, etag=None):
+    """users/show.json에서 profile_image_url만 사용
+    - app 전체가 공유하는 bearer token으로 호출하므로 rate limit(429)에 걸리기 쉽다
+    - 느리면 바로 fallback을 사용하도록 재시도 없이 한 번만 요청 (최대 connect + PROFILE_FETCH_READ_TIMEOUT)
+    """
+    import requests
+
+    headers = {'Authorization': f'Bearer {DevelopmentConfig.TWITTER_BEARER_TOKEN}'}
+    if etag:
+        headers['If-None-Match'] = etag
+
+    try:
+        response = provider_client.get(
+            'Twitter',
+            url=os.path.join(DevelopmentConfig.TWITTER_API_URL, 'users/show.json'),
+            params={'user_id': user_id},
+            headers=headers,
+            retry=False,
+            timeout=(DevelopmentConfig.PROVIDER_CONNECT_TIMEOUT, DevelopmentConfig.PROFILE_FETCH_READ_TIMEOUT)
+        )
+    except requests.RequestException as e:
+        raise ProviderUnavailable(str(e)) from e
+
+    if response.status_code == 304:
+        return NOT_MODIFIED, etag
+    if response.status_code != 200:
+        raise ProviderUnavailable(f'status_code: {response.status_code}')
+
+    response_data = json.loads(response.content)
+    return response_data.get('profile_image_url'), response.headers.get('ETag')
+
+
+def _stored_profile_image_url(platform, user_id):
+    """처음 로그인하는 사용자는 저장된 값이 없으므로 ''"""
+    from src.models.model import User, db_session
+    return db_session.query(User.profile_image_url).filter_by(platform=platform, user_id=str(user_id)).scalar() or ''
+
 
 def map_auth_response_key(resp, platform):
     """플랫폼별로 다른 유저 정보 key 매핑
@@ -36,25 +78,22 @@ def map_auth_response_key(resp, platform):
     elif platform == 'Twitter':
         user_info = resp
         # https://developer.twitter.com/en/docs/twitter-api/v1/accounts-and-users/follow-search-get-users/api-reference/get-users-show
-        with requests.Session() as session:
-            session.headers.update({
-                'Authorization': f'Bearer {DevelopmentConfig.TWITTER_BEARER_TOKEN}'
-            })
-            response = session.get(
-                url=f'https://api.twitter.com/1.1/users/show.json',
-                params={'user_id': user_info.get("user_id")}
-            )
-        response_data = json.loads(response.content)
-        user_info['profile_image_url'] = response_data.get('profile_image_url')
+        user_id = user_info.get('user_id')
+        user_info['profile_image_url'] = profile_cache.get(
+            (platform, user_id),
+            fetch=lambda etag: _fetch_twitter_profile_image_url(user_id, etag),
+            fallback=lambda: _stored_profile_image_url(platform, user_id)
+        )
         user_info['email'] = ''
         user_info['platform'] = platform
     elif platform == 'Kakao':
-        with requests.Session() as session:
-            session.headers.update({
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Authorization': f'Bearer {resp["access_token"]}'
-            })
-            response = session.post('https://kapi.kakao.com/v2/user/me')
+        # GET, POST 모두 지원, 재시도가 가능하도록 GET 사용
+        # https://developers.kakao.com/docs/latest/ko/kakaologin/rest-api#req-user-info
+        response = provider_client.get(
+            platform,
+            url=os.path.join(DevelopmentConfig.KAKAO_API_URL, 'user/me'),
+            headers={'Authorization': f'Bearer {resp["access_token"]}'}
+        )
 
         response_data = json.loads(response.content)
         user_info['oauth_token'] = resp['access_token']
@@ -70,31 +109,78 @@ def map_auth_response_key(resp, platform):
 
     return user_info
 
-oauth = OAuth()
-twitter = oauth.remote_app(
-    'twitter',
-    base_url='https://api.twitter.com/1.1/',
-    request_token_url='https://api.twitter.com/oauth/request_token',
-    authorize_url='https://api.twitter.com/oauth/authorize',
-    access_token_url='https://api.twitter.com/oauth/access_token',
-    consumer_key=DevelopmentConfig.TWITTER_CONSUMER_KEY,
-    consumer_secret=DevelopmentConfig.TWITTER_CONSUMER_SECRET
-)
-
-kakao = oauth.remote_app(
-    'kakao',
-    base_url='https://kapi.kakao.com/v2/',
-    authorize_url='https://kauth.kakao.com/oauth/authorize',
-    access_token_url='https://kauth.kakao.com/oauth/token',
-    consumer_key=DevelopmentConfig.KAKAO_CONSUMER_KEY,
-    consumer_secret=DevelopmentConfig.KAKAO_CONSUMER_SECRET
-)
-
-cognito = oauth.remote_app(
-    'cognito',
-    base_url=os.path.join(DevelopmentConfig.COGNITO_URL, 'oauth2/idpresponse'),
-    authorize_url=os.path.join(DevelopmentConfig.COGNITO_URL, 'oauth2/authorize'),
-    access_token_url=os.path.join(DevelopmentConfig.COGNITO_URL, 'oauth2/token'),
-    consumer_key=DevelopmentConfig.COGNITO_APP_CLIENT_ID,
-    consumer_secret=DevelopmentConfig.COGNITO_APP_CLIENT_SECRET
-)
+_remote_app_settings = {
+    'twitter': lambda: dict(
+        base_url=DevelopmentConfig.TWITTER_API_URL,
+        request_token_url='https://api.twitter.com/oauth/request_token',
+        authorize_url='https://api.twitter.com/oauth/authorize',
+        access_token_url='https://api.twitter.com/oauth/access_token',
+        consumer_key=DevelopmentConfig.TWITTER_CONSUMER_KEY,
+        consumer_secret=DevelopmentConfig.TWITTER_CONSUMER_SECRET
+    ),
+    'kakao': lambda: dict(
+        base_url=DevelopmentConfig.KAKAO_API_URL,
+        authorize_url='https://kauth.kakao.com/oauth/authorize',
+        access_token_url='https://kauth.kakao.com/oauth/token',
+        consumer_key=DevelopmentConfig.KAKAO_CONSUMER_KEY,
+        consumer_secret=DevelopmentConfig.KAKAO_CONSUMER_SECRET
+    ),
+    'cognito': lambda: dict(
+        base_url=os.path.join(DevelopmentConfig.COGNITO_URL, 'oauth2/idpresponse'),
+        authorize_url=os.path.join(DevelopmentConfig.COGNITO_URL, 'oauth2/authorize'),
+        access_token_url=os.path.join(DevelopmentConfig.COGNITO_URL, 'oauth2/token'),
+        consumer_key=DevelopmentConfig.COGNITO_APP_CLIENT_ID,
+        consumer_secret=DevelopmentConfig.COGNITO_APP_CLIENT_SECRET
+    )
+}
+_remote_apps = {}
+_tokengetters = {}
+_remote_apps_lock = threading.Lock()
+oauth = None
+
+
+def get_remote_app(name):
+    """OAuth remote app은 처음 사용할 때 생성 (flask_oauthlib import 포함)"""
+    global oauth
+
+    remote_app = _remote_apps.get(name)
+    if remote_app is not None:
+        return remote_app
+
+    with _remote_apps_lock:
+        if name not in _remote_apps:
+            if oauth is None:
+                from flask_oauthlib.client import OAuth
+                oauth = OAuth()
+            remote_app = oauth.remote_app(name, **_remote_app_settings[name]())
+            if name in _tokengetters:
+                remote_app.tokengetter(_tokengetters[name])
+            _remote_apps[name] = remote_app
+    return _remote_apps[name]
+
+
+def authorized_response(platform):
+    """provider에서 access token 교환"""
+    if platform == 'Twitter':
+        remote_app = get_remote_app('twitter')
+    elif platform == 'Kakao':
+        remote_app = get_remote_app('kakao')
+    else:
+        raise ValueError('incorrect platform parameter')
+
+    started_at = time.perf_counter()
+    try:
+        return remote_app.authorized_response()
+    finally:
+        record(f'provider.{platform}.token', time.perf_counter() - started_at)
+
+
+def tokengetter(name):
+    """remote app 생성 전에도 tokengetter를 등록할 수 있도록 보관했다가 생성 시점에 연결"""
+    def decorator(f):
+        with _remote_apps_lock:
+            _tokengetters[name] = f
+            if name in _remote_apps:
+                _remote_apps[name].tokengetter(f)
+        return f
+    return decorator
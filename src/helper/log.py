@@ -0,0 +1,117 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import threading
+from config import DevelopmentConfig
+
+LOG_FORMAT = '%(asctime)s :: %(levelname)s :: %(message)s'
+
+# header.payload.signature 형태의 JWT
+_jwt_pattern = re.compile(r'eyJ[\w-]+\.[\w-]+\.[\w-]+')
+
+_listener = None
+_init_lock = threading.Lock()
+
+
+class SamplingFilter(logging.Filter):
+    """logger별 sample rate 적용 (WARNING 이상은 항상 통과)
+    - rate는 logger 이름 기준, 없으면 상위 logger의 rate 사용 ('a.b.c' -> 'a.b' -> 'a')
+    """
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self._resolved = {}
+
+    def _rate(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, current = 1.0, name
+            while current:
+                if current in self.rates:
+                    rate = self.rates[current]
+                    break
+                current = current.rpartition('.')[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class RedactionFilter(logging.Filter):
+    """token 값 마스킹, 긴 message는 max_length에서 자른다
+    - 'access_token': '...', access_token=... 형태와 JWT 문자열
+    """
+    def __init__(self, fields, max_length):
+        super().__init__()
+        self.max_length = max_length
+        self._field_pattern = re.compile(
+            r"""(['"]?\b(?:%s)\b['"]?\s*[:=]\s*)(?:'[^']*'|"[^"]*"|[^'",&\s)}]+)""" % '|'.join(map(re.escape, fields))
+        )
+
+    def redact(self, message):
+        message = self._field_pattern.sub(r'\1***', message)
+        message = _jwt_pattern.sub('***', message)
+        if len(message) > self.max_length:
+            message = f'{message[:self.max_length]}... ({len(message)} chars)'
+        return message
+
+    def filter(self, record):
+        record.msg = self.redact(record.getMessage())
+        record.args = None
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """호출한 thread에서는 message 병합만 하고 format, redaction, 출력은 listener thread에서 처리"""
+    def prepare(self, record):
+        if record.exc_info:
+            return super().prepare(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def init_logging(level=None):
+    """프로세스 전체 logging 설정, 여러 번 호출해도 한 번만 적용
+    - 이미 root logger에 handler가 있으면 (lambda runtime 등) 그 handler로 출력
+    - LOG_ASYNC = True: root logger에는 queue에 넣기만 하는 handler를 두고 QueueListener thread에서 출력
+      (lambda에서는 기본값 False, freeze 되는 동안 listener thread가 멈추므로)
+    """
+    global _listener
+
+    with _init_lock:
+        root = logging.getLogger()
+        root.setLevel(level or DevelopmentConfig.LOG_LEVEL)
+        if getattr(root, '_initialized_by_helper', False):
+            return
+
+        handlers = list(root.handlers)
+        if not handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            handlers.append(handler)
+        redaction_filter = RedactionFilter(DevelopmentConfig.LOG_REDACT_FIELDS, DevelopmentConfig.LOG_MAX_MESSAGE_LENGTH)
+        for handler in handlers:
+            handler.addFilter(redaction_filter)
+            root.removeHandler(handler)
+
+        sampling_filter = SamplingFilter(DevelopmentConfig.LOG_SAMPLE_RATES)
+        if DevelopmentConfig.LOG_ASYNC:
+            queue_handler = LazyQueueHandler(queue.SimpleQueue())
+            queue_handler.addFilter(sampling_filter)
+            root.addHandler(queue_handler)
+            _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+        else:
+            for handler in handlers:
+                handler.addFilter(sampling_filter)
+                root.addHandler(handler)
+        root._initialized_by_helper = True
@@ -0,0 +1,210 @@
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from config import DevelopmentConfig
+from src.helper.tracing import register_stats
+
+logger = logging.getLogger(__name__)
+
+# User row를 만들 때 필요한 field (sub 제외)
+USER_FIELDS = ('cognito_username', 'platform', 'user_id', 'email', 'screen_name', 'profile_image_url')
+
+
+class Outbox:
+    """cognito_users table 쓰기를 요청 밖에서 처리 (write-behind)
+    - upsert / delete를 로컬 sqlite 파일에 기록하고 바로 반환, background thread가 batch 단위로 MySQL에 반영
+        - 같은 sub의 변경은 batch 안에서 마지막 것만 반영 (sub 기준 upsert이므로 여러 번 반영되어도 결과가 같다)
+        - 반영에 실패하면 row를 남겨두고 retry_backoff 후 재시도
+    - 반영 전 변경사항은 pending()으로 조회 (load_user가 사용)
+    - 응답 후에도 process가 실행되는 서버용, lambda에서는 응답 시간이 줄지 않는다 (OUTBOX_ENABLED = False 권장)
+        - lambda는 응답 후 컨테이너가 freeze 되어 worker thread와 atexit이 실행된다는 보장이 없다
+        - 그래서 lambda handler(src/handler.py)가 응답을 반환하기 전에 flush(budget)로 남은 변경을 반영 (MySQL 반영 시간이 요청 시간에 포함)
+        - budget 안에 반영하지 못한 변경은 다음 invocation에서 반영, 그 전에 컨테이너가 회수되면 사라진다
+    - 반영되지 못하고 사라진 변경은 cognito가 원본이므로 python -m src.manage reconcile 로 복구
+    """
+    def __init__(self, path, batch_size, flush_interval, retry_backoff):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_backoff = retry_backoff
+        self._pending = {}  # sub -> (outbox id, op, fields)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # worker와 flush() 동시 실행 시 같은 row를 두 번 반영하지 않도록
+        self._wakeup = threading.Event()
+        self._local = threading.local()
+        self._worker = None
+        self._stats = {'enqueued': 0, 'flushed': 0, 'batches': 0, 'failures': 0, 'last_flush_ms': 0.0, 'total_flush_ms': 0.0}
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS outbox '
+                '(id INTEGER PRIMARY KEY AUTOINCREMENT, sub TEXT, op TEXT, payload TEXT, created_at REAL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def start(self):
+        """worker thread 시작, 이전 실행에서 남은 변경이 있으면 pending에 다시 올린다"""
+        with self._lock:
+            if self._worker is not None:
+                return
+            for outbox_id, sub, op, payload in self._connect().execute('SELECT id, sub, op, payload FROM outbox ORDER BY id'):
+                self._pending[sub] = (outbox_id, op, json.loads(payload))
+            self._worker = threading.Thread(target=self._run, name='outbox', daemon=True)
+            self._worker.start()
+        atexit.register(self.flush)
+
+    def _enqueue(self, op, sub, fields):
+        self.start()
+        with self._lock:
+            with self._connect() as connection:
+                outbox_id = connection.execute(
+                    'INSERT INTO outbox (sub, op, payload, created_at) VALUES (?, ?, ?, ?)',
+                    (sub, op, json.dumps(fields), time.time())
+                ).lastrowid
+            self._pending[sub] = (outbox_id, op, fields)
+            self._stats['enqueued'] += 1
+        self._wakeup.set()
+
+    def upsert(self, sub, **fields):
+        self._enqueue('upsert', sub, {field: fields.get(field) for field in USER_FIELDS})
+
+    def delete(self, sub):
+        self._enqueue('delete', sub, {})
+
+    def pending(self, sub):
+        """아직 반영되지 않은 변경 (op, fields), 없으면 None"""
+        item = self._pending.get(sub)
+        return item[1:] if item is not None else None
+
+    def has_pending(self, sub):
+        """다른 프로세스(python -m src.manage 등)에서도 확인할 수 있도록 outbox 파일을 조회"""
+        if sub in self._pending:
+            return True
+        return self._connect().execute('SELECT 1 FROM outbox WHERE sub = ? LIMIT 1', (sub,)).fetchone() is not None
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                while self.flush_batch():
+                    pass
+            except Exception:
+                with self._lock:
+                    self._stats['failures'] += 1
+                logger.exception('outbox flush failed')
+                time.sleep(self.retry_backoff)
+
+    def flush(self, budget=None):
+        """남은 변경을 반영 (종료 시점, 운영 명령, lambda invocation 종료 시)
+        - budget(초)이 있으면 그 시간이 지난 뒤에는 새 batch를 시작하지 않는다 (진행 중인 batch는 끝까지 반영하므로 budget을 넘길 수 있다)
+        - 반영한 row 수 반환
+        """
+        deadline = time.monotonic() + budget if budget is not None else None
+        flushed = 0
+        while True:
+            count = self.flush_batch()
+            flushed += count
+            if not count or (deadline is not None and time.monotonic() >= deadline):
+                return flushed
+
+    def flush_after_invocation(self, budget):
+        """lambda handler에서 응답 반환 전에 호출, 실패해도 응답은 그대로 반환 (남은 변경은 다음 invocation에서)"""
+        if not self._pending:
+            return
+        try:
+            self.flush(budget)
+        except Exception:
+            with self._lock:
+                self._stats['failures'] += 1
+            logger.exception('outbox flush after invocation failed')
+
+    def flush_batch(self):
+        """batch 하나를 하나의 transaction으로 반영, 반영한 row 수 반환"""
+        with self._flush_lock:
+            return self._flush_batch()
+
+    def _flush_batch(self):
+        from src.helper.user_loader import invalidate_user
+        from src.models.model import User, db_session
+
+        rows = self._connect().execute(
+            'SELECT id, sub, op, payload, created_at FROM outbox ORDER BY id LIMIT ?', (self.batch_size,)
+        ).fetchall()
+        if not rows:
+            return 0
+
+        started_at = time.perf_counter()
+        latest = {}
+        for outbox_id, sub, op, payload, created_at in rows:
+            latest[sub] = (op, json.loads(payload), created_at)
+
+        try:
+            upserts = {sub: (fields, created_at) for sub, (op, fields, created_at) in latest.items() if op == 'upsert'}
+            deletes = [sub for sub, (op, _, _) in latest.items() if op == 'delete']
+            if upserts:
+                stored = {user.sub: user for user in db_session.query(User).filter(User.sub.in_(list(upserts)))}
+                for sub, (fields, created_at) in upserts.items():
+                    user = stored.get(sub)
+                    if user is None:
+                        user = User(sub=sub, **fields)
+                        user.regist_date = datetime.fromtimestamp(created_at)
+                        db_session.add(user)
+                    else:
+                        for field, value in fields.items():
+                            setattr(user, field, value)
+                    user.update_date = datetime.fromtimestamp(created_at)
+            if deletes:
+                db_session.query(User).filter(User.sub.in_(deletes)).delete(synchronize_session=False)
+            db_session.commit()
+        finally:
+            db_session.remove()
+
+        last_id = rows[-1][0]
+        with self._lock:
+            with self._connect() as connection:
+                connection.execute('DELETE FROM outbox WHERE id <= ?', (last_id,))
+            for sub in latest:
+                item = self._pending.get(sub)
+                if item is not None and item[0] <= last_id:
+                    del self._pending[sub]
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            self._stats['flushed'] += len(rows)
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = elapsed_ms
+            self._stats['total_flush_ms'] += elapsed_ms
+        for sub in latest:
+            invalidate_user(sub)
+        return len(rows)
+
+    def backlog(self):
+        """sqlite 파일 기준 queue 길이와 가장 오래된 변경의 대기시간(lag), 다른 프로세스(manage 명령)에서도 유효"""
+        count, oldest = self._connect().execute('SELECT COUNT(*), MIN(created_at) FROM outbox').fetchone()
+        return {'queued': count, 'lag_seconds': time.time() - oldest if oldest is not None else 0.0}
+
+    def stats(self):
+        """backlog() + 이 프로세스의 enqueue / flush counter"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(self.backlog())
+        stats['avg_flush_ms'] = stats['total_flush_ms'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+
+outbox = Outbox(
+    path=DevelopmentConfig.OUTBOX_PATH,
+    batch_size=DevelopmentConfig.OUTBOX_BATCH_SIZE,
+    flush_interval=DevelopmentConfig.OUTBOX_FLUSH_INTERVAL,
+    retry_backoff=DevelopmentConfig.OUTBOX_RETRY_BACKOFF
+)
+if DevelopmentConfig.OUTBOX_ENABLED:
+    register_stats('outbox', outbox.stats)
@@ -0,0 +1,71 @@
+import hashlib
+import threading
+from config import DevelopmentConfig
+from src.helper.cache import TTLCache, MISSING
+from src.helper.tracing import register_stats
+
+
+class PageCache:
+    """렌더링 결과 cache
+    - pages: 익명 사용자용 페이지 전체, key -> (body, etag)
+    - fragments: 로그인 사용자 panel, sub -> (iat, html)
+        - token이 재발급되면 (iat 변경) 다시 렌더링
+    - 두 cache 모두 항목 수로 크기를 제한 (LRU)
+    """
+    def __init__(self, page_maxsize, fragment_maxsize, ttl):
+        self.pages = TTLCache(maxsize=page_maxsize, ttl=ttl)
+        self.fragments = TTLCache(maxsize=fragment_maxsize, ttl=ttl)
+        self.stats = {'page_hits': 0, 'page_misses': 0, 'page_skipped': 0, 'fragment_hits': 0, 'fragment_misses': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def stats_snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update(pages=len(self.pages), fragments=len(self.fragments))
+        return stats
+
+    def page(self, key, render):
+        cached = self.pages.get(key)
+        if cached is not MISSING:
+            self._count('page_hits')
+            return cached
+        self._count('page_misses')
+        body = render().encode()
+        cached = (body, hashlib.sha1(body).hexdigest())
+        self.pages.set(key, cached)
+        return cached
+
+    def skip_page(self):
+        """flash message가 있는 등 cache 할 수 없는 익명 요청"""
+        self._count('page_skipped')
+
+    def fragment(self, sub, iat, render):
+        cached = self.fragments.get(sub)
+        if cached is not MISSING and cached[0] == iat:
+            self._count('fragment_hits')
+            return cached[1]
+        self._count('fragment_misses')
+        html = render()
+        self.fragments.set(sub, (iat, html))
+        return html
+
+    def invalidate_user(self, sub):
+        """로그인, 로그아웃, 회원탈퇴 시 호출"""
+        if sub is not None:
+            self.fragments.invalidate(sub)
+
+    def clear(self):
+        self.pages.clear()
+        self.fragments.clear()
+
+
+page_cache = PageCache(
+    page_maxsize=DevelopmentConfig.PAGE_CACHE_SIZE,
+    fragment_maxsize=DevelopmentConfig.FRAGMENT_CACHE_SIZE,
+    ttl=DevelopmentConfig.PAGE_CACHE_TTL
+)
+register_stats('page_cache', page_cache.stats_snapshot)
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import DevelopmentConfig
+from src.helper.cache import TTLCache, MISSING
+from src.helper.tracing import register_stats
+
+logger = logging.getLogger(__name__)
+
+NOT_MODIFIED = object()
+
+
+class ProviderUnavailable(Exception):
+    """provider가 느리거나 rate limit에 걸려 값을 가져오지 못한 경우"""
+
+
+class ProfileCache:
+    """(platform, user_id)별 provider profile 캐시 (stale-while-revalidate)
+    - fresh_ttl 이내: 캐시값 그대로 사용
+    - fresh_ttl ~ stale_ttl: 재검증 (ETag가 있으면 If-None-Match)
+        - background=True: 캐시값을 바로 돌려주고 background thread에서 재검증
+        - background=False: 요청 안에서 재검증, 실패하면 캐시값 사용
+            - lambda는 응답 후 컨테이너가 freeze 되어 background thread가 끝나지 않으므로 이 방식을 사용
+    - 캐시에 없고 provider 호출도 실패하면 fallback (ex. DB에 저장된 값) 사용
+    - fetch(etag)는 (value, etag) 혹은 (NOT_MODIFIED, etag)를 반환하고, 실패 시 ProviderUnavailable
+    """
+    def __init__(self, fresh_ttl, stale_ttl, maxsize, background=True, max_workers=2):
+        self.fresh_ttl = fresh_ttl
+        self.background = background
+        self._cache = TTLCache(maxsize=maxsize, ttl=stale_ttl)
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._max_workers = max_workers
+        self._executor = None
+        self.stats = {'fresh': 0, 'stale': 0, 'miss': 0, 'revalidated': 0, 'not_modified': 0, 'fallback': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def stats_snapshot(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._cache))
+
+    def _store(self, key, value, etag):
+        self._cache.set(key, {'value': value, 'etag': etag, 'fetched_at': time.monotonic()})
+
+    def _fetch(self, key, fetch, entry=None):
+        value, etag = fetch(entry.get('etag') if entry else None)
+        if value is NOT_MODIFIED:
+            self._count('not_modified')
+            value = entry['value']
+        self._store(key, value, etag)
+        return value
+
+    def _revalidate(self, key, fetch, entry):
+        try:
+            self._fetch(key, fetch, entry)
+            self._count('revalidated')
+        except ProviderUnavailable as e:
+            logger.warning('profile revalidation failed %s: %s', key, e)
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+    def _revalidate_inline(self, key, fetch, entry):
+        try:
+            value = self._fetch(key, fetch, entry)
+        except ProviderUnavailable as e:
+            logger.warning('profile revalidation failed %s, using stale value: %s', key, e)
+            return entry['value']
+        self._count('revalidated')
+        return value
+
+    def _revalidate_in_background(self, key, fetch, entry):
+        with self._lock:
+            if key in self._inflight:
+                return
+            self._inflight.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='profile-cache')
+        self._executor.submit(self._revalidate, key, fetch, entry)
+
+    def get(self, key, fetch, fallback=None):
+        entry = self._cache.get(key)
+        if entry is not MISSING:
+            if time.monotonic() - entry['fetched_at'] < self.fresh_ttl:
+                self._count('fresh')
+            else:
+                self._count('stale')
+                if not self.background:
+                    return self._revalidate_inline(key, fetch, entry)
+                self._revalidate_in_background(key, fetch, entry)
+            return entry['value']
+
+        self._count('miss')
+        try:
+            return self._fetch(key, fetch)
+        except ProviderUnavailable as e:
+            if fallback is None:
+                raise
+            logger.warning('profile fetch failed %s, using fallback: %s', key, e)
+            self._count('fallback')
+            return fallback()
+
+    def invalidate(self, key):
+        self._cache.invalidate(key)
+
+
+profile_cache = ProfileCache(
+    fresh_ttl=DevelopmentConfig.PROFILE_CACHE_FRESH_TTL,
+    stale_ttl=DevelopmentConfig.PROFILE_CACHE_STALE_TTL,
+    maxsize=DevelopmentConfig.PROFILE_CACHE_SIZE,
+    background=DevelopmentConfig.PROFILE_CACHE_BACKGROUND_REVALIDATE
+)
+register_stats('profile_cache', profile_cache.stats_snapshot)
@@ -0,0 +1,146 @@
+import bisect
+import random
+import threading
+import time
+from config import DevelopmentConfig
+from src.helper.tracing import record, register_stats
+
+# ms, 마지막 bucket은 그 이상 전부
+LATENCY_BUCKETS = (25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+            self.total += ms
+
+    def snapshot(self):
+        with self._lock:
+            count = sum(self.counts)
+            return {
+                'count': count,
+                'avg_ms': self.total / count if count else 0.0,
+                'buckets': {f'le_{bucket}': n for bucket, n in zip(self.buckets, self.counts)}
+            }
+
+
+def _jitter_retry_class():
+    from urllib3.util.retry import Retry
+
+    class JitterRetry(Retry):
+        """backoff 시간에 0 ~ jitter초의 난수를 더해 동시에 재시도가 몰리지 않도록 한다"""
+        jitter = 0.0
+
+        def new(self, **kw):
+            retry = super().new(**kw)
+            retry.jitter = self.jitter
+            return retry
+
+        def get_backoff_time(self):
+            backoff = super().get_backoff_time()
+            if backoff <= 0:
+                return backoff
+            return backoff + random.uniform(0, self.jitter)
+
+    return JitterRetry
+
+
+class ProviderHttpClient:
+    """소셜 플랫폼(Twitter, Kakao) API 호출용 http client
+    - host별 connection pool + keep-alive를 위해 requests.Session을 프로세스 내에서 공유
+    - connect/read timeout을 항상 지정
+    - 멱등한 GET 요청만 jitter가 포함된 backoff로 재시도
+        - retry=False: 재시도 없이 한 번만 요청 (느리면 fallback을 쓰는 호출용, 별도 connection pool)
+    - provider별 latency histogram 수집
+    """
+    def __init__(self, connect_timeout, read_timeout, max_retries, backoff_factor, jitter, pool_maxsize):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.pool_maxsize = pool_maxsize
+        self.histograms = {}
+        self._session = None
+        self._single_attempt_session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session(retry=True)
+        return self._session
+
+    @property
+    def single_attempt_session(self):
+        if self._single_attempt_session is None:
+            with self._lock:
+                if self._single_attempt_session is None:
+                    self._single_attempt_session = self._build_session(retry=False)
+        return self._single_attempt_session
+
+    def _build_session(self, retry):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        if retry:
+            retry = _jitter_retry_class()(
+                total=self.max_retries,
+                connect=self.max_retries,
+                read=self.max_retries,
+                status=self.max_retries,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset(['GET']),
+                backoff_factor=self.backoff_factor,
+                raise_on_status=False
+            )
+            retry.jitter = self.jitter
+        else:
+            retry = 0  # requests 기본값, connect / read 모두 재시도하지 않는다
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _histogram(self, provider):
+        histogram = self.histograms.get(provider)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(provider, LatencyHistogram())
+        return histogram
+
+    def get(self, provider, url, retry=True, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.session if retry else self.single_attempt_session
+        started_at = time.perf_counter()
+        try:
+            return session.get(url, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self._histogram(provider).observe(elapsed)
+            record(f'provider.{provider}', elapsed)
+
+    def latency_stats(self):
+        return {provider: histogram.snapshot() for provider, histogram in list(self.histograms.items())}
+
+
+provider_client = ProviderHttpClient(
+    connect_timeout=DevelopmentConfig.PROVIDER_CONNECT_TIMEOUT,
+    read_timeout=DevelopmentConfig.PROVIDER_READ_TIMEOUT,
+    max_retries=DevelopmentConfig.PROVIDER_MAX_RETRIES,
+    backoff_factor=DevelopmentConfig.PROVIDER_RETRY_BACKOFF,
+    jitter=DevelopmentConfig.PROVIDER_RETRY_JITTER,
+    pool_maxsize=DevelopmentConfig.PROVIDER_POOL_MAXSIZE
+)
+register_stats('provider_http', provider_client.latency_stats)
@@ -0,0 +1,245 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+from sqlalchemy import func
+from config import DevelopmentConfig
+from src.helper.cognito import Cognito, TokenBucket
+from src.helper.outbox import outbox
+from src.models.model import User, db_session
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """진행 상태를 json 파일로 저장, 중단된 지점부터 재시작"""
+    def __init__(self, path):
+        self.path = path
+        self.state = self._initial_state()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state.update(json.load(f))
+            self.state['stats'].setdefault('kept', 0)
+
+    @staticmethod
+    def _initial_state():
+        return {
+            'phase': 'pool',
+            'pagination_token': None,
+            'last_idx': 0,
+            'max_idx': None,
+            'stats': {'pool_users': 0, 'table_rows': 0, 'inserted': 0, 'updated': 0, 'deleted': 0, 'kept': 0}
+        }
+
+    def reset(self):
+        self.state = self._initial_state()
+        self.save()
+
+    def save(self, **changes):
+        self.state.update(changes)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+
+def _user_row(cognito_user):
+    """cognito list_users의 user -> cognito_users row"""
+    attributes = {row['Name']: row['Value'] for row in cognito_user.get('Attributes', [])}
+    username = cognito_user['Username']
+    platform, _, user_id = username.partition('_')
+    return {
+        'sub': attributes.get('sub'),
+        'cognito_username': username,
+        'platform': platform,
+        'user_id': user_id,
+        'email': attributes.get('email'),
+        'screen_name': attributes.get('name'),
+        'profile_image_url': attributes.get('picture')
+    }
+
+
+class Reconciler:
+    """cognito user pool(원본)과 cognito_users table 동기화
+    - 1단계 (pool): list_users를 page 단위로 조회하며 table에 없는 row는 insert, sub가 다른 row는 update
+        - 조회한 username은 로컬 sqlite 파일(pool index)에 기록
+    - 2단계 (table): table을 server-side cursor로 idx 순서대로 읽으며 pool index에 없는 row의 idx를 기록
+        - 실행 시작 시점의 max idx까지만 확인 (pool을 조회한 뒤 가입한 사용자는 pool index에 없으므로)
+    - 3단계 (delete): 기록된 idx를 batch 단위로 delete (cursor를 연 채로 같은 table을 수정하지 않기 위해 분리)
+        - 삭제 직전에 admin_get_user로 pool에 없는 것을 다시 확인, outbox에 반영 대기 중인 sub도 제외
+    - 메모리에는 page / batch 단위만 올리므로 pool 크기와 상관없이 사용량이 일정
+    - page, batch 처리가 끝날 때마다 checkpoint 저장, 같은 workdir로 다시 실행하면 이어서 진행
+        - 이전 실행이 끝까지 진행된(done) workdir이면 checkpoint와 pool index를 비우고 새로 시작
+    - dry_run은 workdir 대신 임시 디렉토리를 사용하고 끝나면 삭제 (실제 실행의 checkpoint에 영향 없음)
+    """
+    def __init__(self, workdir, rate=5, batch_size=500, dry_run=False, cognito=None):
+        if dry_run:
+            workdir = tempfile.mkdtemp(prefix='reconcile-dry-run-')
+        self.workdir = workdir
+        os.makedirs(workdir, exist_ok=True)
+        self.checkpoint = Checkpoint(os.path.join(workdir, 'checkpoint.json'))
+        self.pool_index = sqlite3.connect(os.path.join(workdir, 'pool_index.db'))
+        self.pool_index.execute('CREATE TABLE IF NOT EXISTS pool_users (username TEXT PRIMARY KEY, sub TEXT)')
+        self.pool_index.execute('CREATE TABLE IF NOT EXISTS orphan_rows (idx INTEGER PRIMARY KEY)')
+        if self.checkpoint.state['phase'] == 'done':
+            self._restart()
+        # cognito_scheduler의 user_read quota와 별도로, 로그인 요청이 쓸 quota를 남겨두기 위한 reconcile 전용 제한
+        self.rate_limiter = TokenBucket(rate, burst=1)
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.cognito = cognito or Cognito()
+
+    def _restart(self):
+        """이전 실행의 pool index가 남아 있으면 그 사이 탈퇴한 사용자를 pool에 있는 것으로 판단하므로 함께 비운다"""
+        self.pool_index.execute('DELETE FROM pool_users')
+        self.pool_index.execute('DELETE FROM orphan_rows')
+        self.pool_index.commit()
+        self.checkpoint.reset()
+
+    @property
+    def stats(self):
+        return self.checkpoint.state['stats']
+
+    def run(self):
+        try:
+            if self.checkpoint.state['max_idx'] is None:
+                self.checkpoint.save(max_idx=self._max_idx())
+            if self.checkpoint.state['phase'] == 'pool':
+                self._reconcile_pool()
+                self.checkpoint.save(phase='table')
+            if self.checkpoint.state['phase'] == 'table':
+                self._reconcile_table()
+                self.checkpoint.save(phase='delete')
+            if self.checkpoint.state['phase'] == 'delete':
+                self._delete_orphans()
+                self.checkpoint.save(phase='done')
+            return self.stats
+        finally:
+            if self.dry_run:
+                self.pool_index.close()
+                shutil.rmtree(self.workdir, ignore_errors=True)
+
+    @staticmethod
+    def _max_idx():
+        try:
+            return db_session.query(func.max(User.idx)).scalar() or 0
+        finally:
+            db_session.remove()
+
+    def _reconcile_pool(self):
+        pagination_token = self.checkpoint.state['pagination_token']
+        while True:
+            self.rate_limiter.acquire()
+            cognito_users, pagination_token = self.cognito.invoke_list_users_page(pagination_token)
+
+            rows = [_user_row(cognito_user) for cognito_user in cognito_users]
+            self.pool_index.executemany(
+                'INSERT OR REPLACE INTO pool_users (username, sub) VALUES (?, ?)',
+                [(row['cognito_username'], row['sub']) for row in rows]
+            )
+            self.pool_index.commit()
+            self._upsert(rows)
+
+            self.stats['pool_users'] += len(rows)
+            self.checkpoint.save(pagination_token=pagination_token)
+            logger.info('reconcile pool: %s', self.stats)
+            if not pagination_token:
+                break
+
+    def _upsert(self, rows):
+        if not rows:
+            return
+        try:
+            stored = {
+                username: (idx, sub)
+                for idx, username, sub in db_session.query(User.idx, User.cognito_username, User.sub)
+                .filter(User.cognito_username.in_([row['cognito_username'] for row in rows]))
+            }
+            inserts = [row for row in rows if row['cognito_username'] not in stored]
+            updates = [
+                {'idx': stored[row['cognito_username']][0], 'sub': row['sub']}
+                for row in rows
+                if row['cognito_username'] in stored and stored[row['cognito_username']][1] != row['sub']
+            ]
+
+            if not self.dry_run:
+                db_session.bulk_insert_mappings(User, inserts)
+                db_session.bulk_update_mappings(User, updates)
+                db_session.commit()
+            self.stats['inserted'] += len(inserts)
+            self.stats['updated'] += len(updates)
+        finally:
+            db_session.remove()
+
+    def _reconcile_table(self):
+        """stream_results: mysql에서는 server-side cursor(SSCursor) 사용"""
+        from src.models.model import engine
+
+        last_idx = self.checkpoint.state['last_idx']
+        with engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, max_row_buffer=self.batch_size).execute(
+                User.__table__.select()
+                .with_only_columns(User.idx, User.cognito_username)
+                .where(User.idx > last_idx, User.idx <= self.checkpoint.state['max_idx'])
+                .order_by(User.idx)
+            )
+            while True:
+                batch = result.fetchmany(self.batch_size)
+                if not batch:
+                    break
+
+                usernames = [row.cognito_username for row in batch]
+                placeholders = ','.join('?' * len(usernames))
+                existing = {
+                    username for username, in self.pool_index.execute(
+                        f'SELECT username FROM pool_users WHERE username IN ({placeholders})', usernames
+                    )
+                }
+                self.pool_index.executemany(
+                    'INSERT OR IGNORE INTO orphan_rows (idx) VALUES (?)',
+                    [(row.idx,) for row in batch if row.cognito_username not in existing]
+                )
+                self.pool_index.commit()
+
+                self.stats['table_rows'] += len(batch)
+                self.checkpoint.save(last_idx=batch[-1].idx)
+                logger.info('reconcile table: %s', self.stats)
+
+    def _is_orphan(self, username, sub):
+        """pool index 작성 이후의 변경을 고려해 삭제 직전에 다시 확인"""
+        if DevelopmentConfig.OUTBOX_ENABLED and outbox.has_pending(sub):
+            return False
+        self.rate_limiter.acquire()
+        platform, _, user_id = username.partition('_')
+        return self.cognito.invoke_admin_get_user(platform, user_id) is None
+
+    def _delete_orphans(self):
+        while True:
+            ids = [idx for idx, in self.pool_index.execute(
+                'SELECT idx FROM orphan_rows ORDER BY idx LIMIT ?', (self.batch_size,)
+            )]
+            if not ids:
+                break
+
+            try:
+                rows = db_session.query(User.idx, User.cognito_username, User.sub).filter(User.idx.in_(ids)).all()
+            finally:
+                db_session.remove()
+
+            orphan_ids = [idx for idx, username, sub in rows if self._is_orphan(username, sub)]
+            if orphan_ids and not self.dry_run:
+                try:
+                    db_session.query(User).filter(User.idx.in_(orphan_ids)).delete(synchronize_session=False)
+                    db_session.commit()
+                finally:
+                    db_session.remove()
+
+            placeholders = ','.join('?' * len(ids))
+            self.pool_index.execute(f'DELETE FROM orphan_rows WHERE idx IN ({placeholders})', ids)
+            self.pool_index.commit()
+            self.stats['deleted'] += len(orphan_ids)
+            self.stats['kept'] += len(rows) - len(orphan_ids)
+            self.checkpoint.save()
+            logger.info('reconcile delete: %s', self.stats)
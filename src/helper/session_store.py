@@ -0,0 +1,281 @@
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from config import DevelopmentConfig
+from src.helper.cache import TTLCache, MISSING
+
+# cookie session과 같은 방식으로 직렬화 (tuple, bytes, datetime 등 유지)
+serializer = TaggedJSONSerializer()
+
+# secrets.token_urlsafe()로 만든 값만 session id로 인정 (FileStore 경로로도 사용)
+_sid_pattern = re.compile(r'^[\w-]{32,64}$')
+
+
+class MemoryStore:
+    """프로세스 내 LRU, warm 컨테이너 하나 안에서만 유지된다 (로컬 개발, 단일 인스턴스용)"""
+    def __init__(self, maxsize):
+        self._cache = TTLCache(maxsize=maxsize)
+
+    def load(self, sid):
+        value = self._cache.get(sid)
+        return None if value is MISSING else value
+
+    def save(self, sid, value, ttl):
+        self._cache.set(sid, value, ttl=ttl)
+
+    def delete(self, sid):
+        self._cache.invalidate(sid)
+
+    def purge_expired(self):
+        return self._cache.purge_expired()
+
+
+class SQLiteStore:
+    """sqlite 파일, 같은 호스트의 여러 프로세스가 공유"""
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, value TEXT, expires_at REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS sessions_expires_at_idx ON sessions (expires_at)')
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def load(self, sid):
+        row = self._connect().execute(
+            'SELECT value FROM sessions WHERE sid = ? AND expires_at > ?', (sid, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, value, ttl):
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO sessions (sid, value, expires_at) VALUES (?, ?, ?)',
+                (sid, value, time.time() + ttl)
+            )
+
+    def delete(self, sid):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def purge_expired(self):
+        with self._connect() as connection:
+            return connection.execute('DELETE FROM sessions WHERE expires_at <= ?', (time.time(),)).rowcount
+
+
+class FileStore:
+    """session 하나당 파일 하나, 첫 줄은 만료시각"""
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid)
+
+    def load(self, sid):
+        try:
+            with open(self._path(sid)) as f:
+                expires_at = float(f.readline())
+                value = f.read()
+        except (OSError, ValueError):
+            return None
+        return value if expires_at > time.time() else None
+
+    def save(self, sid, value, ttl):
+        tmp_path = f'{self._path(sid)}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(f'{time.time() + ttl}\n{value}')
+        os.replace(tmp_path, self._path(sid))
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self):
+        now, purged = time.time(), 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    with open(entry.path) as f:
+                        expires_at = float(f.readline())
+                    if expires_at <= now:
+                        os.remove(entry.path)
+                        purged += 1
+                except (OSError, ValueError):
+                    continue
+        return purged
+
+
+class RedisStore:
+    """redis protocol 호환 서버 (redis, valkey, elasticache), 만료는 서버의 TTL에 맡긴다 (redis package 필요)"""
+    def __init__(self, url, prefix='session:'):
+        import redis
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def load(self, sid):
+        value = self._client.get(f'{self.prefix}{sid}')
+        return value.decode() if value is not None else None
+
+    def save(self, sid, value, ttl):
+        self._client.setex(f'{self.prefix}{sid}', int(ttl), value)
+
+    def delete(self, sid):
+        self._client.delete(f'{self.prefix}{sid}')
+
+    def purge_expired(self):
+        return 0
+
+
+def create_store(backend):
+    if backend == 'memory':
+        return MemoryStore(DevelopmentConfig.SESSION_MEMORY_SIZE)
+    elif backend == 'sqlite':
+        return SQLiteStore(DevelopmentConfig.SESSION_SQLITE_PATH)
+    elif backend == 'file':
+        return FileStore(DevelopmentConfig.SESSION_FILE_DIR)
+    elif backend == 'redis':
+        return RedisStore(DevelopmentConfig.SESSION_REDIS_URL)
+    raise ValueError(f'unknown session backend: {backend}')
+
+
+class ServerSideSession(SessionMixin):
+    """cookie에는 session id만, 값은 store에 저장
+    - 값은 처음 접근할 때 store에서 읽는다 (session을 사용하지 않는 요청은 store 조회 없음)
+    """
+    def __init__(self, store, sid=None):
+        self.store = store
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.regenerated = False
+        self._data = {} if sid is None else None
+
+    @property
+    def data(self):
+        self.accessed = True
+        if self._data is None:
+            value = self.store.load(self.sid)
+            if value is None:
+                self.sid, self.new, self._data = None, True, {}
+            else:
+                self._data = serializer.loads(value)
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        """logout, 탈퇴 이후 flash 등으로 다시 값이 생기면 새 session id로 저장"""
+        self.accessed = True
+        self._data = {}
+        self.modified = True
+        self.regenerated = self.sid is not None
+
+    def regenerate(self):
+        """로그인 직후 session id를 새로 발급 (session fixation 방지)"""
+        self.data
+        self.regenerated = True
+        self.modified = True
+
+
+def regenerate_session_id(session):
+    """server-side session일 때만 id 재발급, cookie session에서는 아무것도 하지 않는다"""
+    if isinstance(session, ServerSideSession):
+        session.regenerate()
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """SESSION_BACKEND != 'cookie' 일 때 사용하는 flask session interface
+    - cookie 값은 추측 불가능한 session id (서명 검증, 직렬화 비용 없음)
+    - 만료된 session은 purge_interval마다 저장 시점에 한 번에 삭제 (manage.py purge-sessions로도 가능)
+    """
+    def __init__(self, store, purge_interval):
+        self.store = store
+        self.purge_interval = purge_interval
+        self._purged_at = time.monotonic()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid is not None and not _sid_pattern.match(sid):
+            sid = None
+        return ServerSideSession(self.store, sid)
+
+    def save_session(self, app, session, response):
+        if not session.accessed and not session.modified:
+            return
+        response.vary.add('Cookie')
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.sid is not None and (session.regenerated or (session.modified and not session)):
+            self.store.delete(session.sid)
+            session.sid = None
+
+        if not session:
+            if session.modified:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        elif not session.modified:
+            return
+
+        self.store.save(session.sid, serializer.dumps(dict(session)), app.permanent_session_lifetime.total_seconds())
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        self._purge_if_due()
+
+    def _purge_if_due(self):
+        if time.monotonic() - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = time.monotonic()
+        self.store.purge_expired()
+
+
+def init_app(app):
+    backend = DevelopmentConfig.SESSION_BACKEND
+    if backend == 'cookie':
+        return
+    app.session_interface = ServerSideSessionInterface(
+        create_store(backend),
+        purge_interval=DevelopmentConfig.SESSION_PURGE_INTERVAL
+    )
@@ -0,0 +1,74 @@
+import threading
+from config import DevelopmentConfig
+from src.helper.tracing import register_stats
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False  # leader가 KeyboardInterrupt, timeout signal 등으로 결과 없이 끝남
+
+
+class SingleFlight:
+    """같은 key로 동시에 들어온 호출은 먼저 시작한 호출(leader)만 실행하고 나머지는 그 결과를 공유
+    - 프로세스 내에서만 동작, 다른 프로세스와의 중복은 DB lock(src.models.lock)으로 처리
+    - follower는 wait_timeout까지만 기다리고, 그래도 끝나지 않거나 leader가 결과 없이 끝나면 직접 실행
+    """
+    def __init__(self, wait_timeout):
+        self.wait_timeout = wait_timeout
+        self.stats = {'calls': 0, 'coalesced': 0, 'wait_timeouts': 0}
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        """(call, leader 여부)"""
+        with self._lock:
+            self.stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats['coalesced'] += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def _finish(self, key, call):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+    def do(self, key, fn):
+        call, leader = self._join(key)
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                with self._lock:
+                    self.stats['wait_timeouts'] += 1
+                return fn()
+            if call.abandoned:
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        call.abandoned = True
+        try:
+            call.result = fn()
+            call.abandoned = False
+            return call.result
+        except Exception as e:
+            call.error = e
+            call.abandoned = False
+            raise
+        finally:
+            self._finish(key, call)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._calls))
+
+
+# cognito username 기준 로그인 처리
+login_flight = SingleFlight(wait_timeout=DevelopmentConfig.LOGIN_FLIGHT_WAIT_TIMEOUT)
+register_stats('login_flight', login_flight.snapshot)
@@ -0,0 +1,107 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from config import DevelopmentConfig
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """프로세스 내에서 공유하는 bounded thread pool"""
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=DevelopmentConfig.STEP_EXECUTOR_WORKERS,
+                    thread_name_prefix='user-flow'
+                )
+    return _pool
+
+
+class StepExecutor:
+    """의존관계가 없는 step을 병렬로 실행
+    - add_step(name, fn, depends_on, compensate)
+        - fn(results): 앞선 step들의 결과(dict)를 받아 실행
+        - compensate(results): 이후 step이 실패했을 때 이미 완료된 step을 되돌리는 함수
+    - step이 실패하면 아직 시작하지 않은 step은 취소, 실행 중인 step은 끝날 때까지 기다린 뒤
+      완료된 step의 compensate를 완료 역순으로 실행하고 처음 발생한 예외를 그대로 raise
+    - step별 소요시간(ms)은 timings에 기록
+    """
+    def __init__(self, name):
+        self.name = name
+        self.timings = {}
+        self._steps = {}
+
+    def add_step(self, name, fn, depends_on=(), compensate=None):
+        self._steps[name] = (fn, tuple(depends_on), compensate)
+
+    def _run_step(self, name, fn, results):
+        started_at = time.perf_counter()
+        try:
+            return fn(results)
+        finally:
+            self.timings[name] = (time.perf_counter() - started_at) * 1000
+
+    def _compensate(self, completed, results):
+        for name in reversed(completed):
+            compensate = self._steps[name][2]
+            if compensate is None:
+                continue
+            try:
+                compensate(results)
+            except Exception:
+                logger.exception('%s: compensation for %s failed', self.name, name)
+
+    def run(self):
+        pool = _get_pool()
+        pending = dict(self._steps)
+        results = {}
+        completed = []
+        running = {}
+        error = None
+
+        started_at = time.perf_counter()
+        while pending or running:
+            for name, (fn, depends_on, _) in list(pending.items()):
+                if all(dependency in results for dependency in depends_on):
+                    # 요청 단위 tracing 등 ContextVar 값이 worker thread에서도 보이도록 context 복사
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, self._run_step, name, fn, dict(results))] = name
+                    del pending[name]
+
+            if not running:
+                raise RuntimeError(f'{self.name}: unresolved step dependencies {list(pending)}')
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    error = error or e
+                else:
+                    completed.append(name)
+
+            if error is not None:
+                pending.clear()
+                for future in list(running):
+                    if future.cancel():
+                        running.pop(future)
+                for future in wait(running).done:
+                    name = running.pop(future)
+                    if future.exception() is None:
+                        results[name] = future.result()
+                        completed.append(name)
+                self._compensate(completed, results)
+                raise error
+
+        self.timings['total'] = (time.perf_counter() - started_at) * 1000
+        logger.debug('%s timings: %s', self.name, self.timings)
+        return results
@@ -0,0 +1,264 @@
+import hashlib
+import logging
+import threading
+import time
+from config import DevelopmentConfig
+from src.helper.cache import TTLCache, MISSING
+from src.helper.cognito import Cognito, CognitoQuotaExceeded
+from src.helper.tracing import register_stats
+
+logger = logging.getLogger(__name__)
+
+# jwt(cryptography), requests, botocore는 cold start 시간을 줄이기 위해 사용 시점에 import
+
+
+def cognito_issuer(user_pool_id):
+    """user pool id는 '<region>_<id>' 형식"""
+    region = user_pool_id.split('_')[0]
+    return f'https://cognito-idp.{region}.amazonaws.com/{user_pool_id}'
+
+
+def cognito_jwks_source(user_pool_id):
+    """user pool의 JWKS를 가져오는 기본 source
+    - https://docs.aws.amazon.com/cognito/latest/developerguide/amazon-cognito-user-pools-using-tokens-verifying-a-jwt.html
+    """
+    url = f'{cognito_issuer(user_pool_id)}/.well-known/jwks.json'
+
+    def fetch():
+        import requests
+        response = requests.get(url, timeout=DevelopmentConfig.JWKS_FETCH_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    return fetch
+
+
+def static_jwks_source(jwks):
+    """로컬 key set을 그대로 돌려주는 source (오프라인 테스트용)"""
+    return lambda: jwks
+
+
+class JWKSKeyCache:
+    """kid별 public key 캐시
+    - 컨테이너당 한번 JWKS를 가져오고, 모르는 kid가 들어왔을 때에만 다시 가져온다
+    - 위조된 kid로 JWKS 요청이 반복되지 않도록 재조회 간격을 min_refresh_interval로 제한
+    """
+    def __init__(self, source, min_refresh_interval=60):
+        self.source = source
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """가져오기에 실패하면 이전 key를 그대로 사용하고 PyJWKClientError
+        - 실패한 경우에도 min_refresh_interval 동안은 다시 요청하지 않는다 (JWKS 장애 시 매 요청마다 timeout 방지)
+        """
+        if self._fetched_at is not None and time.monotonic() - self._fetched_at < self.min_refresh_interval:
+            return
+        import jwt
+        self._fetched_at = time.monotonic()
+        try:
+            jwks = self.source()
+            keys = {jwk['kid']: jwt.PyJWK(jwk).key for jwk in jwks.get('keys', [])}
+        except Exception as e:
+            raise jwt.PyJWKClientError(f'failed to fetch JWKS: {e!r}') from e
+        self._keys = keys
+
+    def preload(self):
+        """warm-up 용: 아직 JWKS를 가져오지 않았으면 가져온다"""
+        with self._lock:
+            if self._fetched_at is None:
+                self._refresh()
+
+    def get_key(self, kid):
+        key = self._keys.get(kid)
+        if key is None:
+            with self._lock:
+                key = self._keys.get(kid)
+                if key is None:
+                    self._refresh()
+                    key = self._keys.get(kid)
+        if key is None:
+            import jwt
+            raise jwt.InvalidTokenError(f'unknown kid: {kid}')
+        return key
+
+
+class TokenVerifier:
+    """cognito id token 서명 검증 + 검증된 claims 캐시
+    - 같은 token은 exp까지 캐시된 claims를 사용 (RS256 검증 반복 방지)
+    - 캐시 key는 token 원문이 아닌 sha256 hash
+    """
+    def __init__(self, key_cache, issuer, audience, token_use='id', cache_size=1024):
+        self.key_cache = key_cache
+        self.issuer = issuer
+        self.audience = audience
+        self.token_use = token_use
+        self.claims_cache = TTLCache(maxsize=cache_size)
+
+    def verify(self, token):
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        claims = self.claims_cache.get(digest)
+        if claims is not MISSING:
+            return claims
+
+        import jwt
+        header = jwt.get_unverified_header(token)
+        claims = jwt.decode(
+            token,
+            key=self.key_cache.get_key(header.get('kid')),
+            algorithms=['RS256'],
+            audience=self.audience,
+            issuer=self.issuer
+        )
+        if claims.get('token_use') != self.token_use:
+            raise jwt.InvalidTokenError(f'unexpected token_use: {claims.get("token_use")}')
+
+        ttl = claims['exp'] - time.time()
+        if ttl > 0:
+            self.claims_cache.set(digest, claims, ttl=ttl)
+        return claims
+
+
+id_token_verifier = TokenVerifier(
+    key_cache=JWKSKeyCache(
+        source=cognito_jwks_source(DevelopmentConfig.COGNITO_USER_POOL_ID),
+        min_refresh_interval=DevelopmentConfig.JWKS_MIN_REFRESH_INTERVAL
+    ),
+    issuer=cognito_issuer(DevelopmentConfig.COGNITO_USER_POOL_ID),
+    audience=DevelopmentConfig.COGNITO_APP_CLIENT_ID,
+    cache_size=DevelopmentConfig.ID_TOKEN_CACHE_SIZE
+)
+
+
+class TokenManager:
+    """sub별 cognito token 관리
+    - admin_initiate_auth(ADMIN_USER_PASSWORD_AUTH)는 비싸고 호출 한도가 낮으므로 최소한으로 사용
+    - 유효한 AccessToken, IdToken이 있으면 그대로 재사용
+    - 만료가 가까우면 RefreshToken(REFRESH_TOKEN_AUTH)으로 갱신
+    - RefreshToken이 없거나 갱신에 실패한 경우에만 admin auth
+    """
+    def __init__(self, refresh_margin, refresh_token_ttl, store_size):
+        self.refresh_margin = refresh_margin
+        self.refresh_token_ttl = refresh_token_ttl
+        self.store = TTLCache(maxsize=store_size, ttl=refresh_token_ttl)
+        self.stats = {'reused': 0, 'refreshed': 0, 'authenticated': 0, 'refresh_failed': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def stats_snapshot(self):
+        with self._lock:
+            return dict(self.stats, stored=len(self.store))
+
+    def _save(self, sub, authentication_result, previous=None):
+        """REFRESH_TOKEN_AUTH 응답에는 RefreshToken이 없으므로 이전 값을 유지"""
+        now = time.time()
+        if previous is None:
+            refresh_token = authentication_result.get('RefreshToken')
+            refresh_expires_at = now + self.refresh_token_ttl
+        else:
+            refresh_token = previous['RefreshToken']
+            refresh_expires_at = previous['RefreshExpiresAt']
+
+        entry = {
+            'AccessToken': authentication_result.get('AccessToken'),
+            'IdToken': authentication_result.get('IdToken'),
+            'RefreshToken': refresh_token,
+            'ExpiresAt': now + authentication_result.get('ExpiresIn', 3600),
+            'RefreshExpiresAt': refresh_expires_at
+        }
+        self.store.set(sub, entry, ttl=refresh_expires_at - now)
+        return entry
+
+    def get_authentication_result(self, cognito, platform, platform_id, sub, force_refresh=False):
+        """force_refresh: user attribute가 바뀌어 id token claims를 새로 받아야 하는 경우"""
+        from botocore.exceptions import ClientError
+        entry = self.store.get(sub)
+
+        if entry is not MISSING:
+            if not force_refresh and entry['ExpiresAt'] - self.refresh_margin > time.time():
+                self._count('reused')
+                return entry
+
+            try:
+                authentication_result = cognito.invoke_admin_refresh_auth(platform, platform_id, entry['RefreshToken'])
+            except (ClientError, CognitoQuotaExceeded) as e:
+                self._count('refresh_failed')
+                logger.warning('refresh token auth failed: %s', e)
+            else:
+                self._count('refreshed')
+                return self._save(sub, authentication_result, previous=entry)
+
+        authentication_result = cognito.invoke_admin_initiate_auth(platform, platform_id)
+        self._count('authenticated')
+        return self._save(sub, authentication_result)
+
+    def revoke(self, sub):
+        self.store.invalidate(sub)
+
+
+token_manager = TokenManager(
+    refresh_margin=DevelopmentConfig.TOKEN_REFRESH_MARGIN,
+    refresh_token_ttl=DevelopmentConfig.REFRESH_TOKEN_TTL,
+    store_size=DevelopmentConfig.TOKEN_STORE_SIZE
+)
+register_stats('token_manager', token_manager.stats_snapshot)
+
+
+def refresh_session_tokens(session, force_refresh=False):
+    """session의 cognito token을 token_manager를 통해 갱신
+    - session token을 사용하는 곳(main.index 등)은 이 함수를 통해 token을 새로 받는다
+    - 유효한 token은 재사용, 만료가 가까우면 refresh token으로 갱신
+    """
+    authentication_result = token_manager.get_authentication_result(
+        Cognito(),
+        session['platform'],
+        session['user_id'],
+        session['sub'],
+        force_refresh=force_refresh
+    )
+    session['access_token'] = authentication_result['AccessToken']
+    session['id_token'] = authentication_result['IdToken']
+    return authentication_result
+
+
+class SessionTokenInvalid(Exception):
+    """session의 id token을 검증할 수 없고 갱신도 불가능 (다시 로그인 필요)"""
+
+
+def _verify_or_none(token):
+    """JWKS를 가져오지 못한 경우 None (token 문제가 아니므로 session은 유지)"""
+    import jwt
+    try:
+        return id_token_verifier.verify(token)
+    except jwt.PyJWKClientError as e:
+        logger.warning('cannot verify id token: %s', e)
+        return None
+
+
+def verify_session_id_token(session):
+    """session id token claims
+    - id token은 1시간 후 만료되므로 만료된 경우 refresh_session_tokens()로 새 token을 받아 다시 검증
+    - 검증 / 갱신에 실패하면 SessionTokenInvalid
+    """
+    import jwt
+    from botocore.exceptions import ClientError
+    expired_token = session['id_token']
+    try:
+        return _verify_or_none(expired_token)
+    except jwt.ExpiredSignatureError:
+        logger.debug('id_token expired, refreshing')
+    except jwt.InvalidTokenError as e:
+        raise SessionTokenInvalid(f'invalid id token: {e}') from e
+
+    try:
+        authentication_result = refresh_session_tokens(session)
+        if authentication_result['IdToken'] == expired_token:
+            # 저장된 만료 시각과 token의 exp가 어긋난 경우
+            refresh_session_tokens(session, force_refresh=True)
+        return _verify_or_none(session['id_token'])
+    except (KeyError, ClientError, jwt.InvalidTokenError) as e:
+        raise SessionTokenInvalid(f'cannot refresh id token: {e}') from e
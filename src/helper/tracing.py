@@ -0,0 +1,273 @@
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from config import DevelopmentConfig
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+_commit_started_at = contextvars.ContextVar('commit_started_at', default=None)
+
+trace_logger = logging.getLogger('trace')
+
+# 이름 -> 통계 dict를 돌려주는 함수 (pool, cache, scheduler 등 프로세스 단위 counter)
+_stats_providers = {}
+_stats_emitted_at = None
+_stats_lock = threading.Lock()
+
+
+class Trace:
+    """요청 하나에서 발생한 외부 호출(cognito, provider, db) 소요시간 모음
+    - span 이름별로 호출 횟수와 누적 시간(ms)을 기록
+    - step executor의 thread에서도 기록하므로 lock으로 보호
+    """
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.perf_counter()
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            span = self.spans.setdefault(name, [0, 0.0])
+            span[0] += 1
+            span[1] += ms
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def server_timing(self, total_ms):
+        """Server-Timing header 값, 예) cognito.SignUp;desc="1";dur=12.3, total;dur=20.1"""
+        metrics = [f'{name};desc="{count}";dur={ms:.1f}' for name, (count, ms) in self.spans.items()]
+        metrics.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(metrics)
+
+    def to_json(self, total_ms, **fields):
+        return json.dumps({
+            'trace': self.name,
+            'total_ms': round(total_ms, 3),
+            'spans': {name: {'count': count, 'ms': round(ms, 3)} for name, (count, ms) in self.spans.items()},
+            **fields
+        })
+
+    def to_emf(self, total_ms, namespace, **fields):
+        """CloudWatch Embedded Metric Format, 로그 한 줄이 endpoint 차원의 metric으로 수집된다"""
+        metrics = {name: round(ms, 3) for name, (_, ms) in self.spans.items()}
+        metrics['total'] = round(total_ms, 3)
+        return json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': namespace,
+                    'Dimensions': [['endpoint']],
+                    'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in metrics]
+                }]
+            },
+            'endpoint': self.name,
+            **metrics,
+            **fields
+        })
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def record(name, seconds):
+    """현재 요청이 sample 되었을 때만 기록, 그렇지 않으면 ContextVar 조회 한 번으로 끝난다"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def start_trace(name, sample_rate=None):
+    """sample 되면 Trace를 현재 context에 설정하고 (trace, reset token) 반환, 아니면 (None, None)"""
+    sample_rate = DevelopmentConfig.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        return None, None
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    if token is not None:
+        _current_trace.reset(token)
+
+
+def emit(trace, **fields):
+    total_ms = trace.elapsed_ms()
+    if DevelopmentConfig.TRACE_LOG_FORMAT == 'emf':
+        trace_logger.info(trace.to_emf(total_ms, DevelopmentConfig.TRACE_EMF_NAMESPACE, **fields))
+    else:
+        trace_logger.info(trace.to_json(total_ms, **fields))
+    return total_ms
+
+
+def register_stats(name, provider):
+    """provider()는 dict 반환, emit_stats()와 warm-up 결과에 포함된다"""
+    _stats_providers[name] = provider
+
+
+def collect_stats():
+    stats = {}
+    for name, provider in list(_stats_providers.items()):
+        try:
+            stats[name] = provider()
+        except Exception as e:
+            stats[name] = {'error': repr(e)}
+    return stats
+
+
+def _numeric_fields(prefix, value):
+    """중첩 dict를 'a.b.c' 이름의 숫자 값으로 펼친다 (EMF metric은 숫자만 가능)"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _numeric_fields(f'{prefix}.{key}' if prefix else str(key), item)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def emit_stats():
+    stats = collect_stats()
+    if DevelopmentConfig.TRACE_LOG_FORMAT == 'emf':
+        metrics = dict(_numeric_fields('', stats))
+        trace_logger.info(json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': DevelopmentConfig.TRACE_EMF_NAMESPACE,
+                    'Dimensions': [[]],
+                    'Metrics': [{'Name': name, 'Unit': 'None'} for name in metrics][:100]  # directive당 최대 100개
+                }]
+            },
+            **metrics
+        }))
+    else:
+        trace_logger.info(json.dumps({'stats': stats}, default=str))
+    return stats
+
+
+def emit_stats_if_due(interval):
+    """마지막 출력 후 interval(초)이 지났으면 출력, 컨테이너의 첫 요청에서는 기준 시각만 기록"""
+    global _stats_emitted_at
+
+    now = time.monotonic()
+    if _stats_emitted_at is not None and now - _stats_emitted_at < interval:
+        return
+    with _stats_lock:
+        if _stats_emitted_at is None:
+            _stats_emitted_at = now
+            return
+        if now - _stats_emitted_at < interval:
+            return
+        _stats_emitted_at = now
+    emit_stats()
+
+
+def _on_boto_before_parameter_build(model, context, **kwargs):
+    # Stubber 등이 before-call에서 응답을 돌려주면 이후 handler가 호출되지 않으므로 그 앞 단계에서 시작 시간 기록
+    if _current_trace.get() is not None:
+        context['trace_started_at'] = time.perf_counter()
+
+
+def _on_boto_after_call(model, context, **kwargs):
+    started_at = context.get('trace_started_at')
+    if started_at is not None:
+        record(f'cognito.{model.name}', time.perf_counter() - started_at)
+
+
+def instrument_boto_client(client):
+    """operation별 (SignUp, AdminInitiateAuth, ...) 소요시간 기록, 재시도 시간 포함"""
+    if not tracing_enabled():
+        return
+    client.meta.events.register('before-parameter-build', _on_boto_before_parameter_build)
+    client.meta.events.register('after-call', _on_boto_after_call)
+    client.meta.events.register('after-call-error', _on_boto_after_call)
+
+
+def instrument_engine(engine):
+    """query(cursor execute)와 commit 소요시간 기록"""
+    if not tracing_enabled():
+        return
+
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_trace.get() is not None:
+            conn.info.setdefault('trace_query_started_at', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = conn.info.get('trace_query_started_at')
+        if started_at:
+            record('db.query', time.perf_counter() - started_at.pop())
+
+    @event.listens_for(engine, 'commit')
+    def before_commit(conn):
+        if _current_trace.get() is not None:
+            _commit_started_at.set(time.perf_counter())
+
+    @event.listens_for(Session, 'after_commit')
+    def after_commit(session):
+        started_at = _commit_started_at.get()
+        if started_at is not None:
+            _commit_started_at.set(None)
+            record('db.commit', time.perf_counter() - started_at)
+
+
+def tracing_enabled():
+    return DevelopmentConfig.TRACE_SAMPLE_RATE > 0
+
+
+def init_trace_logger():
+    """EMF는 로그 한 줄 전체가 json이어야 하므로 prefix 없이 출력"""
+    if trace_logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    trace_logger.addHandler(handler)
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
+
+
+def init_app(app):
+    """요청마다 sample 여부 결정, 응답에 Server-Timing header 추가 후 로그 한 줄 출력
+    - TRACE_SAMPLE_RATE = 0 이면 hook과 event listener를 등록하지 않는다
+    - STATS_LOG_INTERVAL > 0 이면 요청이 끝날 때 interval마다 register_stats()로 등록된 통계를 한 줄 출력
+    """
+    if DevelopmentConfig.STATS_LOG_INTERVAL > 0:
+        init_trace_logger()
+
+        @app.teardown_request
+        def emit_process_stats(exception=None):
+            emit_stats_if_due(DevelopmentConfig.STATS_LOG_INTERVAL)
+
+    if not tracing_enabled():
+        return
+
+    from flask import g, request
+
+    init_trace_logger()
+
+    @app.before_request
+    def start_request_trace():
+        g.trace, g.trace_token = start_trace(request.endpoint or request.path)
+
+    @app.after_request
+    def emit_request_trace(response):
+        trace = g.get('trace')
+        if trace is not None:
+            total_ms = emit(trace, method=request.method, path=request.path, status=response.status_code)
+            if DevelopmentConfig.TRACE_SERVER_TIMING:
+                response.headers['Server-Timing'] = trace.server_timing(total_ms)
+        return response
+
+    @app.teardown_request
+    def end_request_trace(exception=None):
+        token = g.pop('trace_token', None)
+        g.pop('trace', None)
+        end_trace(token)
@@ -1,19 +1,68 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from src.helper.cognito import Cognito
-from src.models.model import User, db_session
+import logging
+import threading
+from config import DevelopmentConfig
+from src.helper.cognito import Cognito, group_registry, registered_user_cache
+from src.helper.outbox import outbox
+from src.helper.singleflight import login_flight
+from src.helper.step_executor import StepExecutor
+from src.helper.token import token_manager
+from src.helper.tracing import register_stats
+from src.helper.user_loader import invalidate_user, load_user
+from src.models.lock import named_lock
+from src.models.model import User, db_session, lock_engine
+
+logger = logging.getLogger(__name__)
+
+# User field -> cognito attribute
+USER_ATTRIBUTE_FIELDS = {
+    'email': 'email',
+    'screen_name': 'name',
+    'profile_image_url': 'picture'
+}
+
+# 기존 사용자 로그인 시 attribute 갱신 여부
+update_stats = {'performed': 0, 'skipped': 0}
+_update_stats_lock = threading.Lock()
+
+
+def _count_update(name):
+    with _update_stats_lock:
+        update_stats[name] += 1
+
+
+def _update_stats_snapshot():
+    with _update_stats_lock:
+        return dict(update_stats)
+
+
+register_stats('user_update', _update_stats_snapshot)
+
+
+def _user_row_fields(user_data):
+    """outbox에 기록할 User row 전체 (sub 제외)"""
+    return {
+        'cognito_username': f'{user_data.get("platform")}_{user_data.get("user_id")}',
+        'platform': user_data.get('platform'),
+        'user_id': user_data.get('user_id'),
+        'email': user_data.get('email'),
+        'screen_name': user_data.get('screen_name'),
+        'profile_image_url': user_data.get('profile_image_url')
+    }
 
 
 class NewUser:
     def __init__(self):
         self.new_user_data = {}
         self.cognito = Cognito()
+        self.timings = {}
 
     def add_data(self, flow, value):
         self.new_user_data[flow] = value
         
-    def sign_up_user(self):
-        sub = self.cognito.invoke_sign_up(
+    def _sign_up(self, results):
+        return self.cognito.invoke_sign_up(
             self.new_user_data.get('platform'),
             self.new_user_data.get('user_id'),
             self.new_user_data.get('email'),
@@ -21,81 +70,185 @@ class NewUser:
             self.new_user_data.get('profile_image_url')
         )
 
+    def _delete_cognito_user(self, results):
+        self.cognito.invoke_admin_delete_user(
+            self.new_user_data.get('platform'),
+            self.new_user_data.get('user_id')
+        )
+
+    def _confirm_sign_up(self, results):
         self.cognito.invoke_admin_confirm_sign_up(
             self.new_user_data.get('platform'),
             self.new_user_data.get('user_id')
         )
 
-        groups = self.cognito.invoke_list_groups()
-        if not self.new_user_data.get('platform') in groups:
-            self.cognito.invoke_create_group(self.new_user_data.get('platform'))
+    def _ensure_group(self, results):
+        group_registry.ensure_group(self.cognito, self.new_user_data.get('platform'))
 
+    def _add_user_to_group(self, results):
         self.cognito.invoke_admin_add_user_to_group(
             self.new_user_data.get('platform'),
             self.new_user_data.get('user_id'),
             self.new_user_data.get('platform')
         )
 
-        user = User(
-            sub=sub,
-            cognito_username=f'{self.new_user_data.get("platform")}_{self.new_user_data.get("user_id")}',
-            platform=self.new_user_data.get('platform'),
-            user_id=self.new_user_data.get('user_id'),
-            email=self.new_user_data.get('email'),
-            screen_name=self.new_user_data.get('screen_name'),
-            profile_image_url=self.new_user_data.get('profile_image_url')
-        )
-        db_session.add(user)
-        db_session.commit()
-
-        authentication_result = self.cognito.invoke_admin_initiate_auth(
+    def _insert_user(self, results):
+        """worker thread에서 실행되므로 thread별 session을 반드시 정리"""
+        if DevelopmentConfig.OUTBOX_ENABLED:
+            outbox.upsert(results['sign_up'], **_user_row_fields(self.new_user_data))
+            return
+        try:
+            user = User(
+                sub=results['sign_up'],
+                cognito_username=f'{self.new_user_data.get("platform")}_{self.new_user_data.get("user_id")}',
+                platform=self.new_user_data.get('platform'),
+                user_id=self.new_user_data.get('user_id'),
+                email=self.new_user_data.get('email'),
+                screen_name=self.new_user_data.get('screen_name'),
+                profile_image_url=self.new_user_data.get('profile_image_url')
+            )
+            db_session.add(user)
+            db_session.commit()
+        finally:
+            db_session.remove()
+        invalidate_user(results['sign_up'])
+
+    def _delete_user_row(self, results):
+        if DevelopmentConfig.OUTBOX_ENABLED:
+            outbox.delete(results['sign_up'])
+            return
+        try:
+            db_session.query(User).filter_by(sub=results['sign_up']).delete()
+            db_session.commit()
+        finally:
+            db_session.remove()
+
+    def _issue_tokens(self, results):
+        return token_manager.get_authentication_result(
+            self.cognito,
             self.new_user_data.get('platform'),
-            self.new_user_data.get('user_id')
+            self.new_user_data.get('user_id'),
+            results['sign_up']
         )
-        return authentication_result, sub
+
+    def _revoke_tokens(self, results):
+        token_manager.revoke(results['sign_up'])
+
+    def sign_up_user(self):
+        """회원가입
+        - sign_up ─┬─ confirm_sign_up ─┬─ add_user_to_group ─ issue_tokens
+                   └─ insert_user      │
+          ensure_group ────────────────┘
+        - id token에 cognito:groups가 포함되도록 group 추가 이후 token 발급
+        - 실패 시 cognito 사용자, DB row, 발급된 token을 되돌린다
+        """
+        steps = StepExecutor('sign_up_user')
+        steps.add_step('sign_up', self._sign_up, compensate=self._delete_cognito_user)
+        steps.add_step('ensure_group', self._ensure_group)
+        steps.add_step('confirm_sign_up', self._confirm_sign_up, depends_on=['sign_up'])
+        steps.add_step('add_user_to_group', self._add_user_to_group, depends_on=['confirm_sign_up', 'ensure_group'])
+        steps.add_step('insert_user', self._insert_user, depends_on=['sign_up'], compensate=self._delete_user_row)
+        steps.add_step('issue_tokens', self._issue_tokens, depends_on=['add_user_to_group'], compensate=self._revoke_tokens)
+        self.timings = steps.timings
+        results = steps.run()
+
+        return results['issue_tokens'], results['sign_up']
 
 
 class ExistingUser:
     def __init__(self) -> None:
         self.existing_user_data = {}
         self.cognito = Cognito()
+        self.changed_fields = {}
+        self.timings = {}
 
     def add_data(self, flow, value):
         self.existing_user_data[flow] = value
 
-    def update_user(self):
+    def _changed_fields(self):
+        """provider에서 받은 정보와 저장된 User row 비교, 변경된 field만 반환"""
+        stored = load_user(self.existing_user_data.get('sub'))
+        changed = {}
+        for field in USER_ATTRIBUTE_FIELDS:
+            value = self.existing_user_data.get(field)
+            if stored is None or (getattr(stored, field) or '') != (value or ''):
+                changed[field] = value
+        return changed
+
+    def _update_attributes(self, results):
         self.cognito.invoke_admin_update_user_attributes(
             self.existing_user_data.get('platform'),
             self.existing_user_data.get('user_id'),
-            self.existing_user_data.get('email'),
-            self.existing_user_data.get('screen_name'),
-            self.existing_user_data.get('profile_image_url')
+            {USER_ATTRIBUTE_FIELDS[field]: value for field, value in self.changed_fields.items()}
         )
 
-        user = db_session.query(User).filter_by(sub=self.existing_user_data.get('sub')).first()
-
-        user.email = self.existing_user_data.get('email'),
-        user.screen_name = self.existing_user_data.get('screen_name'),
-        user.profile_image_url = self.existing_user_data.get('profile_image_url')
-        user.update_date = datetime.now()
-
-        db_session.merge(user)
-        db_session.commit()
-
-        authentication_result = self.cognito.invoke_admin_initiate_auth(
+    def _update_user_row(self, results):
+        """worker thread에서 실행되므로 thread별 session을 반드시 정리"""
+        if DevelopmentConfig.OUTBOX_ENABLED:
+            outbox.upsert(self.existing_user_data.get('sub'), **_user_row_fields(self.existing_user_data))
+            invalidate_user(self.existing_user_data.get('sub'))
+            return
+        try:
+            user = db_session.query(User).filter_by(sub=self.existing_user_data.get('sub')).first()
+            if user is None:
+                logger.warning('user row not found: %s', self.existing_user_data.get('sub'))
+                return
+
+            for field, value in self.changed_fields.items():
+                setattr(user, field, value)
+            user.update_date = datetime.now()
+
+            db_session.commit()
+        finally:
+            db_session.remove()
+        invalidate_user(self.existing_user_data.get('sub'))
+
+    def _issue_tokens(self, results):
+        return token_manager.get_authentication_result(
+            self.cognito,
             self.existing_user_data.get('platform'),
-            self.existing_user_data.get('user_id')
+            self.existing_user_data.get('user_id'),
+            self.existing_user_data.get('sub'),
+            force_refresh=bool(self.changed_fields)
         )
-        return authentication_result
+
+    def update_user(self):
+        """기존 사용자 정보 갱신
+        - 변경된 정보가 없으면 cognito, DB 갱신 없이 token만 발급
+        - update_attributes ─┬─ issue_tokens (id token에 변경된 attribute 반영)
+                             └─ update_user_row
+            - cognito 갱신이 실패하면 DB row도 갱신하지 않는다
+              (row만 바뀌면 다음 로그인에서 변경 없음으로 판단해 cognito attribute가 계속 이전 값으로 남는다)
+        """
+        self.changed_fields = self._changed_fields()
+
+        steps = StepExecutor('update_user')
+        if self.changed_fields:
+            _count_update('performed')
+            steps.add_step('update_attributes', self._update_attributes)
+            steps.add_step('update_user_row', self._update_user_row, depends_on=['update_attributes'])
+            steps.add_step('issue_tokens', self._issue_tokens, depends_on=['update_attributes'])
+        else:
+            _count_update('skipped')
+            steps.add_step('issue_tokens', self._issue_tokens)
+        self.timings = steps.timings
+        results = steps.run()
+
+        return results['issue_tokens']
 
     def unregister_user(self):
         self.cognito.invoke_admin_delete_user(
             self.existing_user_data.get('platform'),
             self.existing_user_data.get('user_id')
         )
+        token_manager.revoke(self.existing_user_data.get('sub'))
 
-        db_session.query(User).filter_by(sub=self.existing_user_data.get('sub')).delete()
-        db_session.commit()
+        if DevelopmentConfig.OUTBOX_ENABLED:
+            outbox.delete(self.existing_user_data.get('sub'))
+        else:
+            db_session.query(User).filter_by(sub=self.existing_user_data.get('sub')).delete()
+            db_session.commit()
+        invalidate_user(self.existing_user_data.get('sub'))
 
 
 class Builder(ABC):
@@ -203,3 +356,50 @@ class Director:
         self.builder.fetch_picture()
         self.builder.fetch_email()
         self.builder.fetch_platform()
+
+
+def update_existing_user(user_info, sub):
+    user_info['sub'] = sub
+    director = Director()
+    builder = ExistingUserBuilder(user_info)
+    director.builder = builder
+    director.load_user_data()
+    return builder.existing_user.update_user(), sub
+
+
+def register_new_user(user_info):
+    """DB lock 안에서 가입 여부를 다시 확인한 뒤 가입
+    - 다른 프로세스에서 같은 사용자를 먼저 가입시켰다면 (negative cache 무시) 기존 사용자로 처리
+    - return: authentication_result, sub
+    """
+    platform, platform_id = user_info['platform'], user_info['user_id']
+    with named_lock(lock_engine, f'sign_up:{platform}_{platform_id}', DevelopmentConfig.LOGIN_LOCK_TIMEOUT):
+        registered_user_cache.invalidate((platform, str(platform_id)))
+        sub = Cognito().is_registered_user(platform, platform_id)
+        if sub:
+            return update_existing_user(user_info, sub)
+
+        director = Director()
+        builder = NewUserBuilder(user_info)
+        director.builder = builder
+        director.load_user_data()
+        return builder.new_user.sign_up_user()
+
+
+def _authenticate_user(user_info):
+    sub = Cognito().is_registered_user(user_info['platform'], user_info['user_id'])
+    if sub:
+        return update_existing_user(user_info, sub)
+    return register_new_user(user_info)
+
+
+def authenticate_user(user_info):
+    """로그인 처리
+    - cognito에 등록된 사용자는 정보 갱신, 신규 사용자는 회원가입
+    - 같은 사용자(cognito username)의 로그인이 동시에 들어오면 먼저 시작한 처리의 결과를 공유
+    - return: authentication_result, sub
+    """
+    return login_flight.do(
+        f"{user_info['platform']}_{user_info['user_id']}",
+        lambda: _authenticate_user(user_info)
+    )
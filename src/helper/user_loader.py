@@ -0,0 +1,70 @@
+from flask import session
+from flask.ctx import _AppCtxGlobals
+from config import DevelopmentConfig
+from src.helper.cache import TTLCache, MISSING
+from src.helper.outbox import outbox
+from src.models.model import User
+from src.models.replica import replica_router
+
+# sub -> User, session에서 분리(expunge)된 객체를 캐시
+user_cache = TTLCache(
+    maxsize=DevelopmentConfig.USER_CACHE_SIZE,
+    ttl=DevelopmentConfig.USER_CACHE_TTL
+)
+
+
+def _query_user(session, sub):
+    user = session.query(User).filter_by(sub=sub).first()
+    if user is not None:
+        session.expunge(user)
+    return user
+
+
+def _load_stored_user(sub):
+    user = user_cache.get(sub)
+    if user is not MISSING:
+        return user
+
+    user = replica_router.read(sub, lambda session: _query_user(session, sub))
+    user_cache.set(sub, user)
+    return user
+
+
+def _with_pending_write(sub, user):
+    """outbox에 아직 반영되지 않은 변경이 있으면 그 내용을 우선 (캐시된 객체는 수정하지 않는다)"""
+    pending = outbox.pending(sub)
+    if pending is None:
+        return user
+    op, fields = pending
+    if op == 'delete':
+        return None
+
+    pending_user = User(sub=sub, **fields)
+    if user is not None:
+        pending_user.idx = user.idx
+        pending_user.regist_date = user.regist_date
+    return pending_user
+
+
+def load_user(sub):
+    user = _load_stored_user(sub)
+    if DevelopmentConfig.OUTBOX_ENABLED:
+        user = _with_pending_write(sub, user)
+    return user
+
+
+def invalidate_user(sub):
+    """사용자 row가 바뀐 뒤 호출, 잠시 동안 이 사용자는 primary에서 조회"""
+    user_cache.invalidate(sub)
+    replica_router.mark_written(sub)
+
+
+class AppGlobals(_AppCtxGlobals):
+    """g.user를 처음 읽을 때에만 사용자 조회
+    - static 파일 요청처럼 g.user를 사용하지 않는 요청은 DB를 조회하지 않는다
+    """
+    def __getattr__(self, name):
+        if name == 'user':
+            self.user = load_user(session['sub']) if 'sub' in session else None
+            return self.user
+        return super().__getattr__(name)
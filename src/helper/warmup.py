@@ -0,0 +1,105 @@
+import logging
+import time
+from config import DevelopmentConfig
+from src.helper.tracing import collect_stats
+
+logger = logging.getLogger(__name__)
+
+# 첫 요청에서 compile 되는 template
+WARMUP_TEMPLATES = ('layout.html', 'index.html', '_user_panel.html')
+
+# scheduled event(serverless-plugin-warmup, eventbridge)의 source 값
+WARMUP_EVENT_SOURCES = ('serverless-plugin-warmup', 'aws.events')
+
+
+def is_warmup_event(event):
+    """{"warmup": true} 또는 warm-up plugin / eventbridge schedule event"""
+    if not isinstance(event, dict):
+        return False
+    return bool(event.get('warmup')) or event.get('source') in WARMUP_EVENT_SOURCES
+
+
+def _warm_cognito():
+    """boto3 client 생성 + list_groups 호출로 connection을 열고 group 목록을 채운다
+    - 반복되는 ping이 quota를 쓰지 않도록 group 목록이 만료되었을 때에만 호출
+    """
+    from src.helper.cognito import Cognito, group_registry
+    group_registry.ensure_loaded(Cognito())
+
+
+def _warm_database():
+    """pool에서 connection을 꺼내 SELECT 1로 확인"""
+    from sqlalchemy import text
+    from src.models.model import engine
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1')).scalar()
+
+
+def _warm_oauth():
+    from src.helper.common import get_remote_app
+    for name in ('twitter', 'kakao', 'cognito'):
+        get_remote_app(name)
+
+
+def _warm_templates(app):
+    for name in WARMUP_TEMPLATES:
+        app.jinja_env.get_template(name)
+
+
+def _warm_assets(app):
+    manifest = app.extensions.get('asset_manifest')
+    if manifest is not None:
+        manifest.load()
+
+
+def _warm_jwks():
+    from src.helper.token import id_token_verifier
+    id_token_verifier.key_cache.preload()
+
+
+def _warm_provider_http():
+    from src.helper.provider_client import provider_client
+    provider_client.session
+    provider_client.single_attempt_session
+
+
+def _warm_outbox():
+    from src.helper.outbox import outbox
+    outbox.start()
+
+
+def warm_up(app):
+    """lazy 초기화되는 resource를 미리 준비, view 코드는 실행하지 않는다
+    - 단계별 소요시간(ms)을 반환, 실패한 단계가 있어도 나머지 단계는 계속 진행
+    - 컨테이너의 프로세스 통계(register_stats)도 함께 반환
+    """
+    steps = [
+        ('cognito', _warm_cognito),
+        ('database', _warm_database),
+        ('oauth', _warm_oauth),
+        ('templates', lambda: _warm_templates(app)),
+        ('assets', lambda: _warm_assets(app)),
+        ('jwks', _warm_jwks),
+        ('provider_http', _warm_provider_http)
+    ]
+    if DevelopmentConfig.OUTBOX_ENABLED:
+        steps.append(('outbox', _warm_outbox))
+    report = {}
+    started_at = time.perf_counter()
+    for name, step in steps:
+        step_started_at = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning('warm-up step %s failed: %r', name, e)
+            report[name] = {'ms': round((time.perf_counter() - step_started_at) * 1000, 3), 'ok': False, 'error': repr(e)}
+        else:
+            report[name] = {'ms': round((time.perf_counter() - step_started_at) * 1000, 3), 'ok': True}
+    result = {
+        'warmup': True,
+        'total_ms': round((time.perf_counter() - started_at) * 1000, 3),
+        'steps': report,
+        'stats': collect_stats()
+    }
+    logger.info('warm-up finished: %s', result)
+    return result
@@ -0,0 +1,73 @@
+"""운영용 명령
+- 사용법: python -m src.manage <command>
+- app(src.app)을 import하지 않으므로 로컬 환경에서도 flask 서버가 실행되지 않는다
+"""
+import argparse
+
+
+def init_db(args):
+    from src.models.model import init_db
+    init_db()
+    print('database initialized')
+
+
+def reconcile(args):
+    from src.helper.reconcile import Reconciler
+    reconciler = Reconciler(
+        workdir=args.workdir,
+        rate=args.rate,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run
+    )
+    print(reconciler.run())
+
+
+def purge_sessions(args):
+    from src.helper.session_store import create_store
+    from config import DevelopmentConfig
+    print(f'purged sessions: {create_store(DevelopmentConfig.SESSION_BACKEND).purge_expired()}')
+
+
+def flush_outbox(args):
+    from src.helper.outbox import outbox
+    flushed = outbox.flush()
+    print(f'flushed: {flushed}, remaining: {outbox.backlog()}')
+
+
+def export_assets(args):
+    """app을 만들지 않고 main blueprint의 static folder만 사용"""
+    from src.helper.assets import AssetManifest
+    from src.web_service.main.views import main as main_blueprint
+    manifest = AssetManifest(main_blueprint.static_folder).export(args.output)
+    print(f'exported {len(manifest)} assets to {args.output}')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m src.manage')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('init-db', help='table, index 생성').set_defaults(func=init_db)
+
+    reconcile_parser = subparsers.add_parser('reconcile', help='cognito user pool 기준으로 cognito_users table 동기화')
+    reconcile_parser.add_argument('--workdir', default='.reconcile', help='checkpoint, pool index 저장 위치 (같은 값으로 재실행하면 이어서 진행)')
+    reconcile_parser.add_argument('--rate', type=float, default=5, help='초당 list_users 호출 수')
+    reconcile_parser.add_argument('--batch-size', type=int, default=500, help='table 조회/삭제 batch 크기 (sqlite 변수 제한으로 999 이하)')
+    reconcile_parser.add_argument('--dry-run', action='store_true', help='변경사항을 DB에 반영하지 않고 집계만 (임시 디렉토리 사용, --workdir의 checkpoint는 사용하지 않음)')
+    reconcile_parser.set_defaults(func=reconcile)
+
+    export_parser = subparsers.add_parser('export-assets', help='hash 파일명, gzip / brotli 압축본을 CDN / S3 업로드용으로 저장')
+    export_parser.add_argument('--output', default='dist/assets')
+    export_parser.set_defaults(func=export_assets)
+
+    subparsers.add_parser('flush-outbox', help='outbox에 남은 cognito_users 변경을 MySQL에 반영 (OUTBOX_ENABLED)').set_defaults(func=flush_outbox)
+    subparsers.add_parser('purge-sessions', help='만료된 server-side session 일괄 삭제 (SESSION_BACKEND 기준)').set_defaults(func=purge_sessions)
+
+    args = parser.parse_args()
+
+    from src.helper.log import init_logging
+    init_logging()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
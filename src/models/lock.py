@@ -0,0 +1,36 @@
+from contextlib import contextmanager
+import hashlib
+from sqlalchemy import text
+
+
+class LockTimeout(Exception):
+    """timeout 안에 DB lock을 얻지 못함"""
+
+
+def _lock_name(name):
+    """mysql lock 이름은 최대 64자"""
+    if len(name) <= 64:
+        return name
+    return hashlib.sha256(name.encode()).hexdigest()
+
+
+@contextmanager
+def named_lock(engine, name, timeout):
+    """여러 프로세스(lambda 컨테이너) 사이의 lock
+    - mysql: GET_LOCK / RELEASE_LOCK (connection 단위이므로 lock을 잡는 동안 connection 하나를 점유)
+        - 요청 처리용 pool이 고갈되지 않도록 pool이 없는 engine(model.lock_engine)을 넘길 것
+    - 그 외 dialect(로컬 sqlite 등)는 단일 프로세스 환경으로 보고 lock 없이 실행
+    """
+    if engine.dialect.name != 'mysql':
+        yield
+        return
+
+    name = _lock_name(name)
+    with engine.connect() as connection:
+        acquired = connection.execute(text('SELECT GET_LOCK(:name, :timeout)'), {'name': name, 'timeout': timeout}).scalar()
+        if acquired != 1:
+            raise LockTimeout(f'could not acquire lock {name} within {timeout}s')
+        try:
+            yield
+        finally:
+            connection.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': name})
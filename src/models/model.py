@@ -1,9 +1,12 @@
 from datetime import datetime
 import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, UniqueConstraint
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Index
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.declarative import declarative_base
 from config import DevelopmentConfig
+from src.helper.tracing import instrument_engine, register_stats
+from src.models.pool import InstrumentedQueuePool, pool_stats
 
 try:
     os.environ['AWS_EXECUTION_ENV']
@@ -12,12 +15,38 @@ except KeyError:
 else:
     database_uri = DevelopmentConfig.SQLALCHEMY_DATABASE_URI
 
-engine = create_engine(database_uri)
+
+def _create_engine(uri):
+    engine = create_engine(
+        uri,
+        poolclass=InstrumentedQueuePool,
+        pool_size=DevelopmentConfig.DB_POOL_SIZE,
+        max_overflow=DevelopmentConfig.DB_MAX_OVERFLOW,
+        pool_timeout=DevelopmentConfig.DB_POOL_TIMEOUT,
+        pool_pre_ping=DevelopmentConfig.DB_POOL_PRE_PING,
+        pool_recycle=DevelopmentConfig.DB_POOL_RECYCLE
+    )
+    instrument_engine(engine)
+    return engine
+
+
+engine = _create_engine(database_uri)
+# named lock(GET_LOCK) 전용, lock을 잡고 있는 동안 요청 처리용 pool의 connection을 점유하지 않도록 pool 없이 연결
+lock_engine = create_engine(database_uri, poolclass=NullPool)
+# read-only 조회용 replica, 지정하지 않으면 모든 조회가 primary(engine)로 간다
+replica_engine = _create_engine(DevelopmentConfig.SQLALCHEMY_DATABASE_URI_REPLICA) if DevelopmentConfig.SQLALCHEMY_DATABASE_URI_REPLICA else None
+register_stats('db_pool', lambda: pool_stats(engine))
+if replica_engine is not None:
+    register_stats('db_replica_pool', lambda: pool_stats(replica_engine))
 Base = declarative_base(engine)
 
 
 class User(Base):
     __tablename__ = 'cognito_users'
+    __table_args__ = (
+        Index('sub_idx', 'sub', unique=True),
+        Index('platform_user_id_idx', 'platform', 'user_id'),
+    )
     idx  = Column('idx', Integer, primary_key=True)
     sub = Column(String(60))
     cognito_username = Column(String(30))
@@ -29,8 +58,6 @@ class User(Base):
     regist_date = Column(DateTime, default=datetime.now())
     update_date = Column(DateTime, default=datetime.now())
 
-    UniqueConstraint(sub, name='sub_idx')
-
     def __init__(
             self,
             sub,
@@ -49,5 +76,17 @@ class User(Base):
         self.screen_name = screen_name
         self.profile_image_url = profile_image_url
 
-Base.metadata.create_all(bind=engine)
-db_session = Session(bind=engine)
+
+def init_db():
+    """table, index 생성
+    - import 시점에 DDL을 실행하면 cold start마다 DB 왕복이 발생하므로 배포/마이그레이션 단계에서 명시적으로 실행
+    - python -m src.manage init-db
+    """
+    Base.metadata.create_all(bind=engine)
+    # create_all은 이미 존재하는 table에 index를 추가하지 않는다
+    for index in User.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+# thread(요청)별 session, app teardown에서 remove
+db_session = scoped_session(sessionmaker(bind=engine))
+replica_session = scoped_session(sessionmaker(bind=replica_engine)) if replica_engine is not None else None
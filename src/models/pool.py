@@ -0,0 +1,74 @@
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """pool 하나의 checkout 통계"""
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.overflow_max = 0
+        self._lock = threading.Lock()
+
+    def timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def checkout(self, waited, overflow):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.overflow_max = max(self.overflow_max, overflow)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_total': self.wait_total,
+                'wait_max': self.wait_max,
+                'wait_avg': self.wait_total / self.checkouts if self.checkouts else 0.0,
+                'overflow_max': self.overflow_max
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """checkout 대기시간, overflow를 기록하는 QueuePool
+    - engine(pool)마다 따로 기록, pool_pre_ping 등으로 pool이 recreate 되어도 같은 통계를 이어서 사용
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkout_stats = self.checkout_stats
+        return pool
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.checkout_stats.timeout()
+            raise
+
+        self.checkout_stats.checkout(time.perf_counter() - started_at, self.overflow())
+        return connection
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = pool.checkout_stats.snapshot()
+    stats.update({
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': pool.overflow()
+    })
+    return stats
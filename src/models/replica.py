@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from config import DevelopmentConfig
+from src.helper.cache import TTLCache, MISSING
+from src.helper.tracing import register_stats
+from src.models.model import db_session, replica_session
+
+logger = logging.getLogger(__name__)
+
+# replica 조회 실패로 보는 예외, pool checkout timeout(replica 과부하)은 DBAPIError가 아니다
+REPLICA_ERRORS = (DBAPIError, PoolTimeoutError)
+
+
+def mysql_replica_lag(lag_query=None):
+    """replica 지연(초)을 조회하는 probe(connection) 생성
+    - lag_query: heartbeat table 등 지연(초)을 scalar로 돌려주는 query (ex. pt-heartbeat)
+    - 없으면 SHOW REPLICA STATUS의 Seconds_Behind_Source 혹은 Seconds_Behind_Master (MySQL 8.0.22 미만은 SHOW SLAVE STATUS)
+        - 결과 row가 없으면 replication 대상이 아니므로 0 (Aurora replica 등은 lag_query 사용)
+        - replication이 멈춘 경우 None
+    """
+    from sqlalchemy import text
+
+    def probe(connection):
+        if lag_query:
+            return connection.execute(text(lag_query)).scalar()
+        try:
+            row = connection.execute(text('SHOW REPLICA STATUS')).mappings().first()
+        except DBAPIError:
+            row = connection.execute(text('SHOW SLAVE STATUS')).mappings().first()
+        if row is None:
+            return 0
+        # MariaDB 등은 SHOW REPLICA STATUS에서도 Seconds_Behind_Master를 돌려준다
+        if 'Seconds_Behind_Source' in row:
+            return row['Seconds_Behind_Source']
+        return row['Seconds_Behind_Master']
+    return probe
+
+
+class ReplicaRouter:
+    """read-only 조회를 replica로 보내고, 아래 경우에는 primary에서 조회
+    - replica를 지정하지 않음
+    - 최근 sticky_seconds 안에 쓰기가 있었던 key (가입, 수정 직후 등 read-after-write)
+        - 프로세스 단위로 기록하므로 같은 컨테이너에서만 효과가 있다
+    - replica 지연이 max_lag(초)보다 큼
+        - lag_check_interval마다 lag_probe(connection)로 조회, 다른 컨테이너에서 수정된 row도 최대 max_lag 만큼만 오래된 값을 읽는다
+        - 지연을 알 수 없으면 (replication 중단, probe 실패) primary
+    - replica에 row가 없음 (lag check 사이에 가입한 사용자)
+    - replica 조회 실패 (pool checkout timeout 포함), 이후 retry_interval 동안은 replica를 사용하지 않는다
+    """
+    def __init__(self, primary, replica, sticky_seconds, retry_interval, lag_probe=None, max_lag=1, lag_check_interval=5,
+                 sticky_maxsize=10000):
+        self.primary = primary
+        self.replica = replica
+        self.retry_interval = retry_interval
+        self.lag_probe = lag_probe
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.stats = {
+            'replica_hits': 0, 'primary_reads': 0, 'sticky_reads': 0,
+            'fallback_missing': 0, 'fallback_lag': 0, 'fallback_error': 0, 'lag': None
+        }
+        self._recent_writes = TTLCache(maxsize=sticky_maxsize, ttl=sticky_seconds)
+        self._replica_down_until = 0.0
+        self._lag_checked_at = None
+        self._lag_ok = False
+        self._lock = threading.Lock()
+        self._lag_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def mark_written(self, key):
+        self._recent_writes.set(key, True)
+
+    def _read_primary(self, query, reason):
+        self._count(reason)
+        return query(self.primary)
+
+    def _replica_failed(self, e):
+        self.replica.remove()
+        self._replica_down_until = time.monotonic() + self.retry_interval
+        logger.warning('replica read failed, using primary for %ss: %r', self.retry_interval, e)
+
+    def _lag_within_limit(self):
+        """lag_check_interval 동안은 마지막 결과 사용, 다른 thread가 조회 중이면 기다리지 않고 이전 결과 사용"""
+        if self.lag_probe is None:
+            return True
+        checked_at = self._lag_checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.lag_check_interval:
+            return self._lag_ok
+        if not self._lag_lock.acquire(blocking=checked_at is None):
+            return self._lag_ok
+
+        try:
+            with self.replica.get_bind().connect() as connection:
+                lag = self.lag_probe(connection)
+            self._lag_ok = lag is not None and lag <= self.max_lag
+            with self._lock:
+                self.stats['lag'] = lag
+            if not self._lag_ok:
+                logger.warning('replica lag (%s) exceeds %ss, using primary', lag, self.max_lag)
+        except Exception as e:
+            # 권한 부족, 예상과 다른 결과 등 probe 실패는 지연을 알 수 없는 것으로 보고 primary 사용
+            logger.warning('replica lag check failed, using primary: %r', e)
+            self._lag_ok = False
+            with self._lock:
+                self.stats['lag'] = None
+        finally:
+            self._lag_checked_at = time.monotonic()
+            self._lag_lock.release()
+        return self._lag_ok
+
+    def read(self, key, query):
+        """query(session) -> 결과, 없으면 None"""
+        if self.replica is None or time.monotonic() < self._replica_down_until:
+            return self._read_primary(query, 'primary_reads')
+        if self._recent_writes.get(key) is not MISSING:
+            return self._read_primary(query, 'sticky_reads')
+
+        try:
+            if not self._lag_within_limit():
+                return self._read_primary(query, 'fallback_lag')
+            result = query(self.replica)
+        except REPLICA_ERRORS as e:
+            self._replica_failed(e)
+            return self._read_primary(query, 'fallback_error')
+        if result is None:
+            return self._read_primary(query, 'fallback_missing')
+        self._count('replica_hits')
+        return result
+
+
+replica_router = ReplicaRouter(
+    primary=db_session,
+    replica=replica_session,
+    sticky_seconds=DevelopmentConfig.REPLICA_STICKY_SECONDS,
+    retry_interval=DevelopmentConfig.REPLICA_RETRY_INTERVAL,
+    lag_probe=mysql_replica_lag(DevelopmentConfig.REPLICA_LAG_QUERY),
+    max_lag=DevelopmentConfig.REPLICA_MAX_LAG_SECONDS,
+    lag_check_interval=DevelopmentConfig.REPLICA_LAG_CHECK_INTERVAL
+)
+if replica_session is not None:
+    register_stats('replica_router', replica_router.snapshot)
@@ -1,6 +1,11 @@
+import logging
 from flask import Blueprint, session, request, redirect, url_for, flash
+from src.helper.cognito import CognitoQuotaExceeded
+from src.helper.page_cache import page_cache
 from src.helper.user_flow import Director, ExistingUserBuilder
 
+logger = logging.getLogger(__name__)
+
 leave = Blueprint(
     name='leave',
     import_name=__name__
@@ -12,7 +17,13 @@ def user_leave():
     director = Director()
     director.builder = builder
     director.load_user_data()
-    builder.existing_user.unregister_user()
+    try:
+        builder.existing_user.unregister_user()
+    except CognitoQuotaExceeded as e:
+        logger.warning('leave delayed by cognito quota: %s', e)
+        flash('요청이 많아 회원탈퇴를 처리하지 못했습니다. 잠시 후 다시 시도해주세요.')
+        return redirect(request.referrer or url_for('main.index'))
+    page_cache.invalidate_user(session.get('sub'))
     session.clear()
     flash('회원탈퇴가 완료되었습니다.')  # session.clear() 이후에 사용해야 main으로 redirect된 이후에도 message가 화면에 출력된다.
     return redirect(request.referrer or url_for('main.index'))
@@ -1,18 +1,14 @@
 from datetime import datetime
 from flask import Blueprint, request, session, url_for, redirect, flash
-from src.helper.cognito import Cognito
-from src.helper.common import twitter, kakao, map_auth_response_key
-from src.helper.user_flow import Director, NewUserBuilder, ExistingUserBuilder
+from src.helper.cognito import CognitoQuotaExceeded
+from src.helper.common import authorized_response, get_remote_app, map_auth_response_key
+from src.helper.page_cache import page_cache
+from src.helper.session_store import regenerate_session_id
+from src.helper.user_flow import authenticate_user
+from src.models.lock import LockTimeout
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s :: %(levelname)s :: %(message)s'
-)
-logger = logging.getLogger()
-logger.setLevel('INFO')
-
-cognito = Cognito()
+logger = logging.getLogger(__name__)
 
 login = Blueprint(
     name='login',
@@ -27,7 +23,7 @@ def twitter_login():
         next=request.args.get('next') or request.referrer or None
     )
     session['platform'] = 'Twitter'
-    return twitter.authorize(callback=url_for_res)
+    return get_remote_app('twitter').authorize(callback=url_for_res)
 
 @login.route('/kakao-login')
 def kakao_login():
@@ -36,45 +32,41 @@ def kakao_login():
         _external=True
     )
     session['platform'] = 'Kakao'
-    return kakao.authorize(callback=url_for_res)
+    return get_remote_app('kakao').authorize(callback=url_for_res)
+
+def _login_succeeded(user_info, authentication_result, sub, next_url):
+    regenerate_session_id(session)
+    page_cache.invalidate_user(sub)
+    session['sub'] = sub
+    session['access_token'] = authentication_result['AccessToken']
+    session['id_token'] = authentication_result['IdToken']
+    session['platform'] = user_info.get('platform')
+    session['user_id'] = user_info.get('user_id')
+
+    logger.debug('authorized session: %s', session)
+    flash('로그인되었습니다.')
+
+    return redirect(next_url)
+
 
 @login.route('/oauth-authorized', methods=['GET'])
 def oauth_authorized():
-    if session['platform'] == 'Twitter':
-        resp = twitter.authorized_response()
-    elif session['platform'] == 'Kakao':
-        resp = kakao.authorized_response()
+    resp = authorized_response(session['platform'])
 
     user_info = map_auth_response_key(resp, session['platform'])
-    logger.info(f'user_info: {user_info}')
+    logger.debug('user_info: %s', user_info)
 
     next_url = request.args.get('next') or url_for('main.index')
     if user_info is None:
         flash(u'로그인 권한 없음')
         return redirect(next_url)
 
-    director = Director()
-
-    sub = cognito.is_registered_user(user_info['platform'], user_info['user_id'])
-    if sub:
-        user_info['sub'] = sub
-        builder = ExistingUserBuilder(user_info)
-        director.builder = builder
-        director.load_user_data()
-        authentication_result = builder.existing_user.update_user()
-    else:
-        builder = NewUserBuilder(user_info)
-        director.builder = builder
-        director.load_user_data()
-        authentication_result, sub = builder.new_user.sign_up_user()
-
-    session['sub'] = sub
-    session['access_token'] = authentication_result['AccessToken']
-    session['id_token'] = authentication_result['IdToken']
-    session['platform'] = user_info.get('platform')
-    session['user_id'] = user_info.get('user_id')
+    try:
+        authentication_result, sub = authenticate_user(user_info)
+    except (CognitoQuotaExceeded, LockTimeout) as e:
+        logger.warning('login delayed: %r', e)
+        flash('요청이 많아 로그인을 처리하지 못했습니다. 잠시 후 다시 시도해주세요.')
+        return redirect(next_url)
 
-    logger.info(f'authorized session: {session}')
-    flash('로그인되었습니다.')
+    return _login_succeeded(user_info, authentication_result, sub, next_url)
 
-    return redirect(next_url)
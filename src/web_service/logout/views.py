@@ -1,4 +1,8 @@
+import logging
 from flask import Blueprint, session, request, redirect, url_for
+from src.helper.page_cache import page_cache
+
+logger = logging.getLogger(__name__)
 
 logout = Blueprint(
     name='logout',
@@ -7,6 +11,7 @@ logout = Blueprint(
 
 @logout.route('/logout')
 def user_logout():
+    page_cache.invalidate_user(session.get('sub'))
     session.clear()
-    print(f'session cleared: {session}')
+    logger.debug('session cleared: %s', session)
     return redirect(request.referrer or url_for('main.index'))
@@ -1,12 +1,10 @@
 import logging
-from flask import Blueprint, flash, render_template, session, g
-import jwt
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s :: %(levelname)s :: %(message)s'
-)
-logger = logging.getLogger()
-logger.setLevel('INFO')
+from flask import Blueprint, flash, make_response, redirect, render_template, request, session, url_for, g
+from markupsafe import Markup
+from src.helper.page_cache import page_cache
+from src.helper.token import SessionTokenInvalid, verify_session_id_token
+
+logger = logging.getLogger(__name__)
 
 
 main = Blueprint(
@@ -17,16 +15,49 @@ main = Blueprint(
     static_url_path='/main/static'
 )
 
+def _conditional_response(body, etag=None, cache_control='no-cache'):
+    """ETag 추가, If-None-Match가 일치하면 304 (cookie에 따라 내용이 달라지므로 매번 재검증)"""
+    response = make_response(body)
+    if etag is None:
+        response.add_etag()
+    else:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
 @main.route('/')
 def index():
-    user_info = None
+    if g.user is None:
+        # flash message는 한 번만 보여야 하므로 cache 하지 않는다
+        if '_flashes' in session:
+            page_cache.skip_page()
+            return _conditional_response(render_template('index.html', user_panel=None))
+        body, etag = page_cache.page(
+            (request.host, request.script_root, request.path),
+            lambda: render_template('index.html', user_panel=None)
+        )
+        return _conditional_response(body, etag)
 
-    if g.user is not None:
-        user_info = jwt.decode(session['id_token'], options={"verify_signature": False})
+    try:
+        user_info = verify_session_id_token(session)
+    except SessionTokenInvalid as e:
+        logger.warning('%s', e)
+        page_cache.invalidate_user(session.get('sub'))
+        session.clear()
+        flash('로그인 정보가 만료되었습니다. 다시 로그인해주세요.')
+        return redirect(url_for('.index'))
 
-        if user_info:
-            logger.info(user_info)
-        else:
-            flash('소셜 플랫폼에서 데이터 로드가 불가능합니다.')
+    user_panel = None
+    if user_info:
+        logger.debug('id_token claims: %s', user_info)
+        user_panel = Markup(page_cache.fragment(
+            user_info['sub'],
+            user_info.get('iat'),
+            lambda: render_template('_user_panel.html', user_info=user_info)
+        ))
+    else:
+        flash('소셜 플랫폼에서 데이터 로드가 불가능합니다.')
 
-    return render_template('index.html', user_info=user_info)
+    return _conditional_response(render_template('index.html', user_panel=user_panel), cache_control='private, no-cache')
@@ -0,0 +1,56 @@
+"""Reconciler 재실행 테스트 (benchmarks/_env의 SQLite 환경 사용)"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+import _env  # noqa: E402
+
+_env.setup()
+
+from src.helper.reconcile import Reconciler  # noqa: E402
+from src.models.model import User, db_session  # noqa: E402
+
+
+class FakeCognito:
+    """list_users / admin_get_user만 흉내내는 user pool"""
+    def __init__(self, usernames):
+        self.usernames = set(usernames)
+        self.list_users_calls = 0
+
+    def invoke_list_users_page(self, pagination_token=None, limit=60):
+        self.list_users_calls += 1
+        users = [
+            {'Username': username, 'Attributes': [{'Name': 'sub', 'Value': f'sub-{username}'}]}
+            for username in sorted(self.usernames)
+        ]
+        return users, None
+
+    def invoke_admin_get_user(self, platform, platform_id):
+        username = f'{platform}_{platform_id}'
+        return f'sub-{username}' if username in self.usernames else None
+
+
+def _stored_usernames():
+    try:
+        return {username for username, in db_session.query(User.cognito_username)}
+    finally:
+        db_session.remove()
+
+
+def test_second_run_rescans_pool(tmp_path):
+    cognito = FakeCognito({'Kakao_1', 'Kakao_2'})
+    workdir = str(tmp_path / 'reconcile')
+
+    first = Reconciler(workdir, rate=1000, cognito=cognito).run()
+    assert first['inserted'] == 2
+    assert _stored_usernames() == {'Kakao_1', 'Kakao_2'}
+
+    # 첫 실행이 끝난 뒤 탈퇴 / 가입
+    cognito.usernames = {'Kakao_1', 'Twitter_3'}
+    second = Reconciler(workdir, rate=1000, cognito=cognito).run()
+
+    assert cognito.list_users_calls == 2
+    assert second['pool_users'] == 2
+    assert second['inserted'] == 1
+    assert second['deleted'] == 1
+    assert _stored_usernames() == {'Kakao_1', 'Twitter_3'}